@@ -0,0 +1,311 @@
+"""Benchmarks of the Parser and Analyzer hot paths
+
+Run from the repository root:
+
+    python benchmarks/bench.py                      # print results as JSON
+    python benchmarks/bench.py -o baseline.json     # save results
+    python benchmarks/bench.py -c baseline.json     # compare to baseline
+
+The realistic tables are built from the ARMv4T example specification in
+examples/armv4t_spec.py, with the filters of examples/armv4t_parser.py.
+The synthetic tables have 10**2, 10**3 and 10**4 random patterns. Each
+benchmark reports the best of several runs. With --compare, a benchmark
+is a regression if it is slower than the baseline by more than the
+threshold, and the exit status is 1 if there is one.
+
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'examples')]
+
+import ocparse  # noqa: E402
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import armv4t_parser as example  # noqa: E402
+    import armv4t_spec  # noqa: E402
+
+NWORDS = 20000
+SIZES = (100, 1000, 10000)
+
+
+def best_of(func, min_time: float = 0.2, max_runs: int = 20) -> float:
+    """Return the shortest time of running func
+
+    func is run at least twice and until min_time has passed in total.
+
+    """
+    times = []
+    start = time.perf_counter()
+    while len(times) < max_runs:
+        t = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t)
+        if len(times) >= 2 and time.perf_counter() - start >= min_time:
+            break
+    return min(times)
+
+
+def armv4t_analyzer() -> ocparse.Analyzer:
+    """Return the ARMv4T tables of the example specification as one set
+
+    """
+    an = armv4t_spec.m31.copy_current()
+    an.merge(armv4t_spec.m32.copy_current())
+    an.merge(armv4t_spec.m33.copy_current())
+    return an
+
+
+def armv4t_parser(an: ocparse.Analyzer, method: str = 'tree'
+                  ) -> ocparse.Parser:
+    """Return parser for the ARMv4T set with the example filters
+
+    Patterns noted [1] in the specification do not allow cond 1111.
+    Method 'linear' gives a parser that is not compiled.
+
+    """
+    filters = {c.desc: example.dprocfilter for c in an.get_codes()
+               if '[1]' in c.desc}
+    p = an.to_parser(field_names={'c': 'cond'}, filters=filters,
+                     method='tree' if method == 'linear' else method)
+    if method == 'linear':
+        linear = ocparse.Parser()
+        for o in p.opcodes:
+            linear.add(o[0])
+        return linear
+    return p
+
+
+def synthetic_analyzer(n: int, seed: int = 1) -> ocparse.Analyzer:
+    """Return analyzer with n random 32-bit patterns
+
+    Like the opcode field of an instruction set, the top bits of each
+    pattern hold a distinct number. About half of the other bits are
+    fixed, and the rest form contiguous fields of up to 8 bits. Half of
+    the patterns have a one-bit 'S' field.
+
+    """
+    rnd = random.Random(seed)
+    letters = 'abcdefghijklmnopqrtuvwxyz'
+    k = max(n - 1, 1).bit_length()
+    ids = rnd.sample(range(2**k), n)
+    patterns = []
+    for ii in range(n):
+        p = list('{:0{}b}'.format(ids[ii], k))
+        nf = 0
+        while len(p) < 32:
+            k = min(rnd.randint(1, 8), 32 - len(p))
+            if rnd.random() < 0.5:
+                p += [rnd.choice('01') for _ in range(k)]
+            else:
+                p += [letters[nf % len(letters)]] * k
+                nf += 1
+        if rnd.random() < 0.5:
+            fixed = [b for b in range(32) if p[b] in '01']
+            if fixed:
+                p[rnd.choice(fixed)] = 'S'
+        patterns.append((''.join(p), 'op{}'.format(ii)))
+    return ocparse.Analyzer(patterns)
+
+
+def sample_words(an: ocparse.Analyzer, n: int, seed: int = 2) -> list:
+    """Return n words that each match a random pattern of the analyzer
+
+    Don't-care and field bits are random, except that bits 31-28 are
+    1110, the ARM 'always' condition, where the pattern allows it.
+
+    """
+    rnd = random.Random(seed)
+    codes = [c for c in an.get_codes() if len(c) == 32]
+    words = []
+    for _ in range(n):
+        c = rnd.choice(codes)
+        w = (rnd.getrandbits(32) & ~c.care_mask) | c.value
+        if not c.care_mask >> 28:
+            w = w & 0x0fffffff | 0xe0000000
+        words.append(w)
+    return words
+
+
+def random_words(n: int, seed: int = 3) -> list:
+    rnd = random.Random(seed)
+    return [rnd.getrandbits(32) for _ in range(n)]
+
+
+def bench_parse(results: dict, name: str, parser: ocparse.Parser,
+                words: list):
+    """Time parse per word and parse_buffer for the words
+
+    """
+    parse = parser.parse
+    parse(words[0])
+    buf = struct.pack('<{}I'.format(len(words)), *words)
+
+    def loop():
+        for w in words:
+            parse(w)
+
+    add(results, 'parse.' + name, best_of(loop), len(words))
+    add(results, 'parse_buffer.' + name,
+        best_of(lambda: parser.parse_buffer(buf)), len(words))
+
+
+def bench_analyzer(results: dict, name: str, an: ocparse.Analyzer,
+                   field: str, heavy: bool = True):
+    """Time the Analyzer operations on a copy of the analyzer
+
+    """
+    add(results, 'ambiguities.' + name,
+        best_of(an.ambiguities, max_runs=5), len(an))
+    add(results, 'bitworth.' + name,
+        best_of(an.bitworth, max_runs=5), len(an))
+    for mode in ('list', 'lazy', 'compact'):
+        def expand():
+            a = an.copy_current()
+            if mode == 'compact':
+                a.compact()
+            a.expand_field(field, lazy=mode == 'lazy')
+            return sum(1 for _ in a.codes[a.cp])
+        add(results, 'expand_field.{}.{}'.format(mode, name),
+            best_of(expand, max_runs=5), len(an))
+    if heavy:
+        def combine():
+            a = an.copy_current()
+            a.combinecodes()
+        add(results, 'combinecodes.' + name,
+            best_of(combine, max_runs=3), len(an))
+
+
+def bench_startup(results: dict, an: ocparse.Analyzer):
+    """Time import, building, compiling and loading of parsers
+
+    """
+    cmd = [sys.executable, '-c', 'import ocparse']
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    add(results, 'startup.import',
+        best_of(lambda: subprocess.run(cmd, env=env, check=True),
+                max_runs=5), 1)
+    add(results, 'startup.to_parser.armv4t',
+        best_of(lambda: armv4t_parser(an, 'tree')), len(an))
+    p = armv4t_parser(an, 'tree')
+    add(results, 'startup.compile_tree.armv4t',
+        best_of(lambda: p.compile('tree')), len(an))
+    add(results, 'startup.compile_table.armv4t',
+        best_of(lambda: p.compile('table')), len(an))
+    p.compile('tree')
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'armv4t.ocp')
+        p.dump(path)
+        add(results, 'startup.load.armv4t',
+            best_of(lambda: ocparse.Parser.load(path)), len(an))
+
+
+def add(results: dict, name: str, seconds: float, items: int):
+    results[name] = {'seconds': seconds, 'items': items,
+                     'ns_per_item': seconds / max(items, 1) * 1e9}
+    print('{:<44} {:>12.6f} s {:>12.1f} ns/item'.format(
+        name, seconds, results[name]['ns_per_item']), file=sys.stderr)
+
+
+def run(sizes: tuple, only: None | str) -> dict:
+    results = {}
+    an = armv4t_analyzer()
+    groups = {
+        'parse': lambda: parse_group(results, an, sizes),
+        'analyzer': lambda: analyzer_group(results, an, sizes),
+        'startup': lambda: bench_startup(results, an),
+    }
+    for name, group in groups.items():
+        if only is None or only == name:
+            group()
+    return results
+
+
+def parse_group(results: dict, an: ocparse.Analyzer, sizes: tuple):
+    realistic = sample_words(an, NWORDS)
+    uniform = random_words(NWORDS)
+    for method in ('linear', 'tree', 'table'):
+        p = armv4t_parser(an, method)
+        bench_parse(results, 'armv4t.{}.random'.format(method), p, uniform)
+        bench_parse(results, 'armv4t.{}.realistic'.format(method), p,
+                    realistic)
+    bench_parse(results, 'example.linear.random', example.op, uniform)
+    for n in sizes:
+        syn = synthetic_analyzer(n)
+        p = syn.to_parser()
+        bench_parse(results, 'synthetic{}.tree.random'.format(n), p,
+                    uniform)
+        bench_parse(results, 'synthetic{}.tree.realistic'.format(n), p,
+                    sample_words(syn, NWORDS))
+
+
+def analyzer_group(results: dict, an: ocparse.Analyzer, sizes: tuple):
+    bench_analyzer(results, 'armv4t', an, 'c')
+    for n in sizes:
+        bench_analyzer(results, 'synthetic{}'.format(n),
+                       synthetic_analyzer(n), 'S', heavy=n <= 1000)
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> bool:
+    """Print ratio to baseline for each benchmark
+
+    :returns: True if no benchmark is slower than threshold allows
+
+    """
+    ok = True
+    base = baseline['results']
+    for name, r in results.items():
+        if name not in base:
+            print('{:<44} {:>10}'.format(name, 'new'))
+            continue
+        ratio = r['seconds'] / base[name]['seconds']
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  REGRESSION'
+            ok = False
+        elif ratio < 1 - threshold:
+            flag = '  faster'
+        print('{:<44} {:>9.2f}x{}'.format(name, ratio, flag))
+    return ok
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    ap.add_argument('-o', '--output', help='file to write results to')
+    ap.add_argument('-c', '--compare', help='baseline results file')
+    ap.add_argument('-t', '--threshold', type=float, default=0.2,
+                    help='relative slowdown counted as regression')
+    ap.add_argument('-g', '--group', choices=('parse', 'analyzer', 'startup'),
+                    help='run only this group of benchmarks')
+    ap.add_argument('-s', '--sizes', type=int, nargs='+', default=SIZES,
+                    help='sizes of synthetic tables')
+    args = ap.parse_args()
+    data = {'python': platform.python_version(),
+            'platform': platform.platform(),
+            'results': run(tuple(args.sizes), args.group)}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(data, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        sys.exit(0 if compare(data['results'], baseline,
+                              args.threshold) else 1)
+    if not args.output:
+        json.dump(data, sys.stdout, indent=1)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,8 +2,8 @@ import ocparse
 
 # defining two patterns and a parser 
 op = ocparse.Parser()
-def dprocfilter(d):
-    return d['cond'] != 15
+# filters declared as constraints are folded into the parser's index
+dprocfilter = ocparse.field_ne('cond', 15)
 
 oc1 = ocparse.Opcode('Data_Processing_Immediate',
                      'cccc|001ooooS|nnnnddddrrrr|iiii|iiii',
@@ -11,8 +11,7 @@ oc1 = ocparse.Opcode('Data_Processing_Immediate',
 oc1.rename_field('c', 'cond', 'o', 'opcode', 'n', 'Rn', 'd', 'Rd',
                  'r', 'rotate_imm', 'i', 'immed_8')
 op.add(oc1)
-def msrfilter(d):
-    return (d['cond'] != 0b1111) and (d['SBO'] == 0b1111)
+msrfilter = ocparse.field_ne('cond', 0b1111) & ocparse.field_eq('SBO', 0b1111)
 
 oc2 = ocparse.Opcode('Move_immediate_to_status_register',
                      'cccc|00110R10|MMMMOOOOrrrr|iiii|iiii',
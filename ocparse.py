@@ -7,11 +7,32 @@
    **AnalyzerOpcode** that can be used for analysis of
    instruction sets and their decoding.
 
-   The module is written with fixed-width instructions in mind.
+   The module is written with fixed-width instructions in mind. Streams
+   that mix instructions of different widths, like Thumb and Thumb-2, are
+   parsed by **StreamParser** with one Parser for each width.
 
 """
 from __future__ import annotations
+import array
+import collections
+import concurrent.futures
+import functools
+import importlib
+import itertools
+import json
+import marshal
 import math
+import mmap
+import operator
+import os
+import re
+import struct
+import time
+import weakref
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 
 def strip_sep(s: str, seps=(' ', '_', '|')) -> str:
@@ -76,6 +97,400 @@ def zip_sep(s: str, sepl: list[str, ...]) -> str:
     return sout
 
 
+def _no_filter(d: dict) -> bool:
+    """Default parameter filter of Opcode, accepts all values
+
+    """
+    return True
+
+
+class _Record(tuple):
+    """Base class of compact decoding results
+
+    A record holds the values of the fields of an opcode in a tuple, while
+    the name of the opcode and the field names are attributes of the
+    class, shared by all records of the opcode. Fields can be read as
+    attributes or by name as with the dictionaries returned by
+    Opcode.decode.
+
+    """
+    __slots__ = ()
+    name = None
+    _fields = ()
+    _index = {}
+
+    def __getitem__(self, key):
+        if key.__class__ is str:
+            if key == 'name' and 'name' not in self._index:
+                return self.name
+            return tuple.__getitem__(self, self._index[key])
+        return tuple.__getitem__(self, key)
+
+    def __eq__(self, other):
+        if isinstance(other, _Record):
+            return self.name == other.name and \
+                self._fields == other._fields and tuple.__eq__(self, other)
+        if isinstance(other, dict):
+            return self._asdict() == other
+        return NotImplemented
+
+    def __ne__(self, other):
+        eq = self.__eq__(other)
+        return eq if eq is NotImplemented else not eq
+
+    def __hash__(self):
+        return hash((self.name, tuple.__hash__(self)))
+
+    def __reduce__(self):
+        return (_make_record, (self.name, self._fields, tuple(self)))
+
+    def __repr__(self):
+        return '{}({})'.format(self.name, ', '.join(
+            '{}={!r}'.format(k, v) for k, v in zip(self._fields, self)))
+
+    def keys(self) -> tuple[str, ...]:
+        """Return names of opcode name and fields as keys of dictionary
+
+        """
+        return ('name',) + self._fields
+
+    def _asdict(self) -> dict:
+        """Return dictionary as returned by Opcode.decode
+
+        """
+        d = {'name': self.name}
+        d.update(zip(self._fields, self))
+        return d
+
+
+_record_classes = {}
+
+
+def _record_class(name: str, fields: tuple[str, ...]) -> type:
+    """Return record class for opcode name and field names
+
+    """
+    cls = _record_classes.get((name, fields))
+    if cls is None:
+        attrs = {'__slots__': (), 'name': name, '_fields': fields,
+                 '_index': {k: n for n, k in enumerate(fields)}}
+        for n, k in enumerate(fields):
+            attrs[k] = property(operator.itemgetter(n))
+        cls = type('Record', (_Record,), attrs)
+        _record_classes[(name, fields)] = cls
+    return cls
+
+
+def _make_record(name: str, fields: tuple[str, ...],
+                 values: tuple[int, ...]) -> _Record:
+    return tuple.__new__(_record_class(name, fields), values)
+
+
+def _segments(bits: list[int, ...]) -> tuple[tuple[int, int, int], ...]:
+    """Make segment list of a field from its bit positions
+
+    The bits are given most significant first in the order they are
+    concatenated into the value of the field. Each segment is a tuple
+    (rshift, mask, lshift) of a run of adjacent bits that stay in order,
+    and the value is the bitwise or of ((code >> rshift) & mask) << lshift
+    over the segments.
+
+    """
+    segs = []
+    n = len(bits)
+    k = 0
+    while k < n:
+        j = k + 1
+        while j < n and bits[j] == bits[j - 1] - 1:
+            j += 1
+        segs.append((bits[j - 1], 2**(j - k) - 1, n - j))
+        k = j
+    return tuple(segs)
+
+
+def _gather_segments(code: int, segs: tuple[tuple[int, int, int], ...]
+                     ) -> int:
+    v = 0
+    for rshift, mask, lshift in segs:
+        v |= ((code >> rshift) & mask) << lshift
+    return v
+
+
+_MAX_CUBES = 16
+
+
+def _interval_cubes(lo: int, hi: int, width: int
+                    ) -> list[tuple[int, int], ...]:
+    """Split interval of field values into disjoint (mask, pattern) cubes
+
+    """
+    top = 2**width - 1
+    cubes = []
+    while lo <= hi:
+        size = lo & -lo if lo else top + 1
+        while size > hi - lo + 1:
+            size >>= 1
+        cubes.append((top ^ (size - 1), lo))
+        lo += size
+    return cubes
+
+
+def _cube_sub(c: tuple[int, int], a: tuple[int, int]
+              ) -> list[tuple[int, int], ...]:
+    """Return disjoint cubes covering cube c without cube a
+
+    """
+    (cm, cp), (am, ap) = c, a
+    if (cp ^ ap) & cm & am:
+        return [c]
+    out = []
+    free = am & ~cm
+    while free:
+        b = free & -free
+        free ^= b
+        out.append((cm | b, cp | (~ap & b)))
+        cm |= b
+        cp |= ap & b
+    return out
+
+
+class Constraint():
+    """Declarative parameter filter of an opcode
+
+    Constraints are made with field_eq, field_ne, field_in and
+    field_range and combined with & (and) and | (or), e.g.
+    field_ne('cond', 15) & field_eq('SBO', 15). A constraint can be
+    called with the dictionary or record of decoded fields like any
+    other param_filter, but Parser can also see what it tests. When an
+    index is compiled, the allowed field values are turned into masks and
+    patterns, so that the index tests them and the filter is not called
+    at all. Constraints that need too many patterns for that are only
+    partly folded and are checked after decoding, inlined by
+    generate_decoder and on whole arrays by classify_array.
+
+    :param tree: Nested tuples ('in', field, values), ('ne', field,
+                 values), ('range', field, lo, hi), ('and', terms) or
+                 ('or', terms), where values is a frozenset of integers
+                 and terms a tuple of trees
+
+    """
+    def __init__(self, tree: tuple):
+        """Constructor method
+
+        """
+        self._tree = self._checked(tree)
+        self._func = eval("lambda d: " + self._source(
+            lambda k: "d[{!r}]".format(k)))
+
+    def __call__(self, d) -> bool:
+        return self._func(d)
+
+    def __reduce__(self):
+        return (Constraint, (self._tree,))
+
+    def __and__(self, other: 'Constraint') -> 'Constraint':
+        return Constraint(('and', self._terms('and') + other._terms('and')))
+
+    def __or__(self, other: 'Constraint') -> 'Constraint':
+        return Constraint(('or', self._terms('or') + other._terms('or')))
+
+    def __repr__(self):
+        return self._repr(self._tree)
+
+    @classmethod
+    def _checked(cls, t: tuple) -> tuple:
+        """Return tree with all values made integers by operator.index
+
+        The values are written into the source of the filter, so anything
+        that is not an integer raises TypeError.
+
+        """
+        if t[0] in ('and', 'or'):
+            return (t[0], tuple(cls._checked(x) for x in t[1]))
+        if t[0] == 'range':
+            return (t[0], t[1], operator.index(t[2]), operator.index(t[3]))
+        if t[0] in ('in', 'ne'):
+            return (t[0], t[1], frozenset(map(operator.index, t[2])))
+        raise Exception("unknown constraint \"{}\"".format(t[0]))
+
+    def _terms(self, op: str) -> tuple:
+        return self._tree[1] if self._tree[0] == op else (self._tree,)
+
+    @classmethod
+    def _repr(cls, t: tuple) -> str:
+        if t[0] in ('and', 'or'):
+            sep = ' & ' if t[0] == 'and' else ' | '
+            return '(' + sep.join(cls._repr(x) for x in t[1]) + ')'
+        if t[0] == 'range':
+            return 'field_range({!r}, {}, {})'.format(*t[1:])
+        values = sorted(t[2])
+        if len(values) == 1:
+            return 'field_{}({!r}, {})'.format(
+                'eq' if t[0] == 'in' else 'ne', t[1], values[0])
+        return 'field_in({!r}, {})'.format(t[1], values)
+
+    def _source(self, get, t: None | tuple = None) -> str:
+        """Make Python expression of the constraint
+
+        :param get: Function returning expression of a field by name
+
+        """
+        t = self._tree if t is None else t
+        if t[0] in ('and', 'or'):
+            return '(' + ' {} '.format(t[0]).join(
+                self._source(get, x) for x in t[1]) + ')'
+        x = get(t[1])
+        if t[0] == 'range':
+            return '({} <= ({}) <= {})'.format(t[2], x, t[3])
+        values = sorted(t[2])
+        if len(values) == 1:
+            return '(({}) {} {})'.format(x, '==' if t[0] == 'in' else '!=',
+                                         values[0])
+        return '(({}) {} {{{}}})'.format(x, 'in' if t[0] == 'in'
+                                         else 'not in',
+                                         ', '.join(map(str, values)))
+
+    def _array(self, get, t: None | tuple = None):
+        """Evaluate the constraint on NumPy arrays of field values
+
+        :param get: Function returning array of a field by name
+
+        """
+        t = self._tree if t is None else t
+        if t[0] in ('and', 'or'):
+            r = self._array(get, t[1][0])
+            for x in t[1][1:]:
+                if t[0] == 'and':
+                    r &= self._array(get, x)
+                else:
+                    r |= self._array(get, x)
+            return r
+        x = get(t[1])
+        if t[0] == 'range':
+            lo = max(t[2], 0)
+            if t[3] < lo:
+                return np.zeros(x.shape, dtype=bool)
+            hi = min(t[3], 2**64 - 1)
+            return (x >= np.uint64(lo)) & (x <= np.uint64(hi))
+        r = np.isin(x, np.array([v for v in t[2] if v >= 0],
+                                dtype=np.uint64))
+        return r if t[0] == 'in' else ~r
+
+    def _cubes(self, opc: Opcode, t: None | tuple = None
+               ) -> None | list[tuple[int, int], ...]:
+        """Return disjoint (mask, pattern) cubes of the allowed codes
+
+        The cubes only cover the field bits of opc. Returns None if more
+        than _MAX_CUBES cubes are needed.
+
+        """
+        t = self._tree if t is None else t
+        if t[0] == 'and':
+            cubes = [(0, 0)]
+            for x in t[1]:
+                other = self._cubes(opc, x)
+                if other is None:
+                    return None
+                cubes = [(cm | am, cp | ap) for cm, cp in cubes
+                         for am, ap in other if not (cp ^ ap) & cm & am]
+                if len(cubes) > _MAX_CUBES:
+                    return None
+            return cubes
+        if t[0] == 'or':
+            cubes = []
+            for x in t[1]:
+                other = self._cubes(opc, x)
+                if other is None:
+                    return None
+                for a in cubes:
+                    other = [r for c in other for r in _cube_sub(c, a)]
+                cubes += other
+                if len(cubes) > _MAX_CUBES:
+                    return None
+            return cubes
+        pos = opc._field_bits(t[1])
+        top = 2**len(pos) - 1
+        if t[0] == 'range':
+            intervals = [(max(t[2], 0), min(t[3], top))]
+        elif t[0] == 'ne':
+            intervals = []
+            lo = 0
+            for v in sorted(v for v in t[2] if 0 <= v <= top):
+                intervals.append((lo, v - 1))
+                lo = v + 1
+            intervals.append((lo, top))
+        else:
+            intervals = []
+            for v in sorted(v for v in t[2] if 0 <= v <= top):
+                if intervals and intervals[-1][1] == v - 1:
+                    intervals[-1] = (intervals[-1][0], v)
+                else:
+                    intervals.append((v, v))
+        cubes = []
+        for lo, hi in intervals:
+            cubes += _interval_cubes(lo, hi, len(pos))
+            if len(cubes) > _MAX_CUBES:
+                return None
+
+        def spread(v):
+            return sum(1 << p for j, p in enumerate(pos) if v >> j & 1)
+
+        return [(spread(m), spread(p)) for m, p in cubes]
+
+    def _fold(self, opc: Opcode) -> tuple[list[tuple[int, int], ...], bool]:
+        """Fold constraint into masks and patterns for opcode
+
+        :returns: Tuple (cubes, exact). If exact, a code of the opcode
+                  passes the constraint if and only if it matches one of
+                  the cubes. Otherwise there is one cube with the bits
+                  that all allowed codes have in common, and the
+                  constraint must still be checked.
+
+        """
+        cubes = self._cubes(opc)
+        if cubes is not None:
+            return cubes, True
+        mask = pattern = 0
+        for t in self._terms('and'):
+            part = self._cubes(opc, t)
+            if not part:
+                continue
+            m = functools.reduce(operator.and_, (c[0] for c in part))
+            for c in part:
+                m &= ~(c[1] ^ part[0][1])
+            mask |= m
+            pattern |= part[0][1] & m
+        return [(mask, pattern)], False
+
+
+def field_eq(field: str, value: int) -> Constraint:
+    """Return constraint that field equals value
+
+    """
+    return Constraint(('in', field, frozenset((value,))))
+
+
+def field_ne(field: str, value: int) -> Constraint:
+    """Return constraint that field is not equal to value
+
+    """
+    return Constraint(('ne', field, frozenset((value,))))
+
+
+def field_in(field: str, values) -> Constraint:
+    """Return constraint that field has one of the values
+
+    """
+    return Constraint(('in', field, frozenset(values)))
+
+
+def field_range(field: str, lo: int, hi: int) -> Constraint:
+    """Return constraint that lo <= field <= hi
+
+    """
+    return Constraint(('range', field, lo, hi))
+
+
 class Opcode():
     """Opcode pattern for use by the opcode parser
 
@@ -89,10 +504,22 @@ class Opcode():
     :param param_filter:  Logical function with dictionary as parameter.
                           Dictionary holds values opcode fields.
                           Returns True if values are valid, otherwise False.
+                          A Constraint made with field_eq, field_ne,
+                          field_in and field_range can be folded into
+                          the index of a compiled Parser.
+    :param field_order:   Dictionary of field letter to list of its bit
+                          positions, most significant first, in the order
+                          they make up the value of the field
+
+    A letter may be used in several separate runs of bits, e.g. for split
+    immediates. By default the value of such a field is its bits
+    concatenated as they appear in the pattern, from left to right.
+    These fields are kept in segments rather than params, and come after
+    the other fields in the decoded dictionary.
 
     """
     def __init__(self, name: str, pattern_str: str,
-                 param_filter=lambda x: True):
+                 param_filter=_no_filter, field_order: None | dict = None):
         """Constructor method
 
         """
@@ -104,44 +531,59 @@ class Opcode():
         self.mask = 0
         self.params = {}
         self.param_filter = param_filter
-        cp = None
-        cmask = 0
-        rshift = 0
+        self._parsers = weakref.WeakSet()
+        self._record_cls = None
+        self.segments = {}
+        positions = {}
         d = 1
-        n = 0
-        for c in pattern_str[::-1]:
+        for n, c in enumerate(pattern_str[::-1]):
             if c == '1':
                 self.pattern += d
                 self.mask += d
             elif c == '0':
                 self.mask += d
-            if c in '10*' and cp is not None:
-                if cp in self.params:
-                    raise Exception(
-                        "parameter \"{}\" already defined".format(c))
-                self.params[cp] = (cmask, rshift)
-                cp = None
-            elif c not in '10*' and cp is not None and c != cp:
-                if cp in self.params:
-                    raise Exception(
-                        "parameter \"{}\" already defined".format(cp))
-                self.params[cp] = (cmask, rshift)
-                cp = c
-                rshift = n
-                cmask = d
-            elif c not in '10*' and cp is None:
-                cp = c
-                rshift = n
-                cmask = d
-            elif c == cp:
-                cmask += d
-            n += 1
+            elif c != '*':
+                positions.setdefault(c, []).append(n)
             d *= 2
-        if cp is not None:
-            if cp in self.params:
-                raise Exception(
-                    "parameter \"{}\" already defined".format(c))
-            self.params[cp] = (cmask, rshift)
+        for c, bits in positions.items():
+            if bits[-1] - bits[0] == len(bits) - 1:
+                self.params[c] = (2**len(bits) - 1 << bits[0], bits[0])
+            else:
+                self.segments[c] = _segments(bits[::-1])
+        for c, bits in (field_order or {}).items():
+            self.set_field_order(c, bits)
+
+    @classmethod
+    def _make(cls, name: str, pattern_str: str, pattern: int, mask: int,
+              params: dict, param_filter=_no_filter,
+              segments: None | dict = None) -> 'Opcode':
+        """Make opcode from precomputed pattern, mask and fields
+
+        """
+        opc = cls.__new__(cls)
+        opc.name = name
+        opc.pattern_str = pattern_str
+        opc._len = len(pattern_str)
+        opc.pattern = pattern
+        opc.mask = mask
+        opc.params = params
+        opc.segments = segments or {}
+        opc.param_filter = param_filter
+        opc._parsers = weakref.WeakSet()
+        opc._record_cls = None
+        return opc
+
+    def __getstate__(self):
+        # the record class is made on demand and can not be pickled
+        state = self.__dict__.copy()
+        del state['_parsers']
+        del state['_record_cls']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._parsers = weakref.WeakSet()
+        self._record_cls = None
 
     def __repr__(self):
         fmt = "{{:0{}b}}\n".format(self._len)
@@ -151,6 +593,9 @@ class Opcode():
         for k in self.params:
             str += k + '\n'
             str += fmt.format(self.params[k][0])
+        for k, segs in self.segments.items():
+            str += k + '\n'
+            str += fmt.format(sum(m << sh for sh, m, _ in segs))
         return str
 
     def __len__(self):
@@ -168,8 +613,74 @@ class Opcode():
 
         """
         for p in zip(pairs[0::2], pairs[1::2]):
-            self.params[p[1]] = self.params[p[0]]
-            self.params.pop(p[0])
+            if p[0] in self.segments:
+                self.segments[p[1]] = self.segments.pop(p[0])
+            else:
+                self.params[p[1]] = self.params[p[0]]
+                self.params.pop(p[0])
+        self._record_cls = None
+        for parser in self._parsers:
+            parser._invalidate()
+
+    def set_field_order(self, field: str, bits: list[int, ...]):
+        """Set the order in which the bits of a field make up its value
+
+        :param field: Field name
+        :param bits:  The bit positions of the field, most significant
+                      first
+
+        """
+        if field in self.segments:
+            have = sum(m << sh for sh, m, _ in self.segments[field])
+        elif field in self.params:
+            have = self.params[field][0]
+        else:
+            raise Exception("no field \"{}\"".format(field))
+        if len(set(bits)) != len(bits) or sum(1 << b for b in bits) != have:
+            raise Exception("bits do not match field \"{}\"".format(field))
+        self.params.pop(field, None)
+        self.segments[field] = _segments(bits)
+        self._record_cls = None
+        for parser in self._parsers:
+            parser._invalidate()
+
+    def fields(self) -> tuple[str, ...]:
+        """Return names of fields in the order they are decoded
+
+        """
+        return tuple(self.params) + tuple(self.segments)
+
+    def _field_bits(self, field: str) -> list[int, ...]:
+        """Return bit positions of a field, least significant value bit first
+
+        """
+        x = self._extractor(field)
+        if x[0].__class__ is not tuple:
+            return list(range(x[1], x[0].bit_length()))
+        bits = [0] * sum(m.bit_length() for _, m, _ in x)
+        for rshift, mask, lshift in x:
+            for j in range(mask.bit_length()):
+                bits[lshift + j] = rshift + j
+        return bits
+
+    def _extractor(self, field: str) -> tuple:
+        """Return (mask, rshift) pair or segment list of a field
+
+        """
+        if field in self.params:
+            return self.params[field]
+        if field in self.segments:
+            return self.segments[field]
+        raise Exception("no field \"{}\" in opcode \"{}\"".format(
+            field, self.name))
+
+    def _unfiltered(self) -> 'Opcode':
+        """Return copy of opcode without parameter filter
+
+        """
+        return Opcode._make(self.name, self.pattern_str, self.pattern,
+                            self.mask, self.params, _no_filter,
+                            self.segments)
 
     def decode(self, code: int) -> None | dict:
         """ Return dictionary of parameters if code matches opcode
@@ -182,11 +693,82 @@ class Opcode():
             d['name'] = self.name
             for k in self.params:
                 d[k] = (code & self.params[k][0]) >> self.params[k][1]
+            if self.segments:
+                for k, segs in self.segments.items():
+                    d[k] = _gather_segments(code, segs)
             if self.param_filter(d):
                 return d
             else:
                 return None
 
+    def decode_record(self, code: int) -> None | _Record:
+        """Return record of parameters if code matches opcode
+
+        Like decode, but the result is a compact tuple-based record with
+        the fields as attributes. The record is also what the parameter
+        filter gets, so the filter can read but not change the values.
+
+        """
+        if code >= 2**self._len:
+            return None
+        if 0 == (code ^ self.pattern) & self.mask:
+            cls = self._record_cls
+            if cls is None:
+                cls = self._record_cls = _record_class(
+                    self.name, self.fields())
+            values = [(code & m) >> sh for m, sh in self.params.values()]
+            if self.segments:
+                values += [_gather_segments(code, segs)
+                           for segs in self.segments.values()]
+            r = tuple.__new__(cls, values)
+            if self.param_filter(r):
+                return r
+            else:
+                return None
+
+    def _decode_profiled(self, code: int, record: bool,
+                         st: list[int, ...], mask: None | int = None,
+                         pattern: int = 0) -> None | dict | _Record:
+        """Decode like decode or decode_record and count in st
+
+        st is the list [attempts, matches, filter calls, filter
+        rejections, filter time in ns] of Parser.profile. mask and
+        pattern of a dispatch entry replace those of the opcode.
+
+        """
+        st[0] += 1
+        if mask is None:
+            mask, pattern = self.mask, self.pattern
+        if code >= 2**self._len or (code ^ pattern) & mask:
+            return None
+        st[1] += 1
+        if record:
+            cls = self._record_cls
+            if cls is None:
+                cls = self._record_cls = _record_class(
+                    self.name, self.fields())
+            d = tuple.__new__(cls, [(code & m) >> sh
+                                    for m, sh in self.params.values()] +
+                              [_gather_segments(code, segs)
+                               for segs in self.segments.values()])
+        else:
+            d = {}
+            d['name'] = self.name
+            for k in self.params:
+                d[k] = (code & self.params[k][0]) >> self.params[k][1]
+            for k, segs in self.segments.items():
+                d[k] = _gather_segments(code, segs)
+        if self.param_filter is _no_filter:
+            return d
+        st[2] += 1
+        t = time.perf_counter_ns()
+        ok = self.param_filter(d)
+        st[4] += time.perf_counter_ns() - t
+        if ok:
+            return d
+        st[3] += 1
+        return None
+
     def intersect(self, oc: Opcode) -> int:
         """Check if opcode patterns can overlap
 
@@ -197,22 +779,463 @@ class Opcode():
             return 0
 
 
+def _make_leaf(entries: list[tuple, ...]) -> list[tuple, ...]:
+    """Make leaf of decision tree from entries in evaluation order
+
+    Each entry is extended with its rivals: the entries after it that can
+    match the same code and that have the same or a better priority.
+    Once an entry has matched, only its rivals need to be tried.
+
+    """
+    leaf = []
+    for k, e in enumerate(entries):
+        rivals = tuple(r for r in entries[k+1:] if r[3] <= e[3]
+                       and 0 == (r[1] ^ e[1]) & r[0] & e[0])
+        leaf.append(e + (rivals,))
+    return leaf
+
+
+def _eval_leaf(leaf: list[tuple, ...], code: int) -> list[dict, ...]:
+    """Decode code with the entries of a leaf
+
+    Returns the interpretations with the best priority in the order the
+    opcodes were added to the parser.
+
+    """
+    for mask, pattern, decode, pri, idx, rivals in leaf:
+        if not (code ^ pattern) & mask:
+            d = decode(code)
+            if d is not None:
+                break
+    else:
+        return []
+    if not rivals:
+        return [d]
+    hits = [(pri, idx, d)]
+    for mask, pattern, decode, pri, idx in rivals:
+        if not (code ^ pattern) & mask:
+            d = decode(code)
+            if d is not None:
+                hits.append((pri, idx, d))
+    if len(hits) == 1:
+        return [hits[0][2]]
+    best = min(h[0] for h in hits)
+    return [h[2] for h in sorted(hits) if h[0] == best]
+
+
+def _build_tree(entries: list[tuple, ...], width: int,
+                leaf_size: int = 1,
+                weights: None | list[float, ...] = None,
+                max_nodes: None | int = None) -> tuple | list:
+    """Build decision tree from dispatch entries
+
+    An internal node is a tuple (bit, zero_branch, one_branch) and a leaf
+    is a list made by _make_leaf. Entries that do not care about the bit
+    of a node go into both branches. Nodes are shared between
+    identical sets of entries, so the result is a DAG.
+
+    To keep the tree from growing exponentially on patterns with many
+    don't care bits, a bit is not tested if more than half of the
+    entries go into both branches, and once max_nodes nodes and leaves
+    have been made, the remaining entries of a branch form one leaf.
+    max_nodes defaults to 16 times the number of entries plus 1024.
+
+    With weights, the relative frequency of each entry, a node tests the
+    bit that gives the fewest opcodes left on average over the words
+    rather than in the worst case.
+
+    """
+    memo = {}
+    if max_nodes is None:
+        max_nodes = 16 * len(entries) + 1024
+
+    def split(cands):
+        node = memo.get(cands)
+        if node is not None:
+            return node
+        n = len(cands)
+        best = None
+        if n > leaf_size and len(memo) < max_nodes:
+            for b in range(width):
+                bit = 1 << b
+                n0 = n1 = 0
+                for k in cands:
+                    if entries[k][0] & bit:
+                        if entries[k][1] & bit:
+                            n1 += 1
+                        else:
+                            n0 += 1
+                nx = n - n0 - n1
+                worst = max(n0, n1) + nx
+                key = (worst, nx)
+                if weights is not None:
+                    w0 = w1 = wx = 0
+                    for k in cands:
+                        if not entries[k][0] & bit:
+                            wx += weights[k]
+                        elif entries[k][1] & bit:
+                            w1 += weights[k]
+                        else:
+                            w0 += weights[k]
+                    key = ((w0 + wx/2) * (n0 + nx) + (w1 + wx/2) * (n1 + nx),
+                           worst, nx)
+                if worst < n and 2 * nx <= n and \
+                        (best is None or key < best[0]):
+                    best = (key, bit)
+        if best is None:
+            node = _make_leaf([entries[k] for k in cands])
+        else:
+            bit = best[1]
+            c0 = tuple(k for k in cands if not entries[k][0] & bit
+                       or not entries[k][1] & bit)
+            c1 = tuple(k for k in cands if not entries[k][0] & bit
+                       or entries[k][1] & bit)
+            node = (bit, split(c0), split(c1))
+        memo[cands] = node
+        return node
+
+    return split(tuple(range(len(entries))))
+
+
+def _as_uint64(words):
+    """Return array of words as uint64 NumPy array
+
+    """
+    if np is None:
+        raise Exception("numpy is required for array parsing")
+    words = np.asarray(words)
+    if words.dtype.kind not in 'ui':
+        raise Exception("words must be an array of integers")
+    return words.astype(np.uint64, copy=False)
+
+
+_WORD_FORMATS = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}
+
+
+def _iter_words(b: memoryview, width: int, endian: str, start: int,
+                end: int, stride: None | int = None):
+    """Iterate over instruction words in a byte memoryview
+
+    Words are read from byte start up to byte end, stride bytes apart.
+
+    """
+    if width % 8 or width <= 0:
+        raise Exception("width must be a positive multiple of 8")
+    if endian not in ('little', 'big'):
+        raise Exception("endian must be 'little' or 'big'")
+    size = width // 8
+    if stride is None:
+        stride = size
+    if stride < size:
+        raise Exception("stride is smaller than the word size")
+    end = min(end, len(b))
+    if end - start < size:
+        return iter(())
+    fmt = _WORD_FORMATS.get(size)
+    if fmt is None:
+        return (int.from_bytes(b[pos:pos+size], endian)
+                for pos in range(start, end - size + 1, stride))
+    fmt = ('<' if endian == 'little' else '>') + fmt
+    if stride == size:
+        n = (end - start) // size
+        return (w for w, in struct.iter_unpack(fmt, b[start:start+n*size]))
+    unpack_from = struct.Struct(fmt).unpack_from
+    return (unpack_from(b, pos)[0]
+            for pos in range(start, end - size + 1, stride))
+
+
+def _field_array(w, x: tuple):
+    """Extract a field from a uint64 NumPy array of words
+
+    :param x: (mask, rshift) pair or segment list of the field
+
+    """
+    if x and x[0].__class__ is tuple:
+        v = np.zeros_like(w)
+        for rshift, mask, lshift in x:
+            v |= ((w >> np.uint64(rshift)) & np.uint64(mask)) \
+                << np.uint64(lshift)
+        return v
+    return (w & np.uint64(x[0])) >> np.uint64(x[1])
+
+
+def _regions(start: int, end: int,
+             skip: list[tuple[int, int], ...]) -> list[tuple[int, int], ...]:
+    """Return the (start, end) ranges left when skip ranges are removed
+
+    """
+    regions = []
+    for a, b in sorted(skip):
+        if a > start:
+            regions.append((start, min(a, end)))
+        start = max(start, b)
+        if start >= end:
+            break
+    if start < end:
+        regions.append((start, end))
+    return [r for r in regions if r[0] < r[1]]
+
+
+def _func_ref(func) -> None | str:
+    """Return reference 'package.module:name' to a function
+
+    Returns None if the function can not be imported by that name,
+    e.g. if it is a lambda or defined within another function.
+
+    """
+    ref = '{}:{}'.format(getattr(func, '__module__', None),
+                         getattr(func, '__qualname__', '<>'))
+    if '<' in ref:
+        return None
+    try:
+        if _resolve_ref(ref) is func:
+            return ref
+    except (ImportError, AttributeError):
+        pass
+    return None
+
+
+def _field_expr(mask: int, rshift: int) -> str:
+    """Make Python expression extracting a field from code
+
+    """
+    if rshift:
+        return "(code & {:#x}) >> {}".format(mask, rshift)
+    return "code & {:#x}".format(mask)
+
+
+def _extractor_expr(x: tuple) -> str:
+    """Make Python expression for a (mask, rshift) pair or segment list
+
+    """
+    if x and x[0].__class__ is tuple:
+        terms = []
+        for rshift, mask, lshift in x:
+            t = "(code >> {}) & {:#x}".format(rshift, mask) if rshift \
+                else "code & {:#x}".format(mask)
+            terms.append("(({}) << {})".format(t, lshift) if lshift
+                         else "({})".format(t))
+        return ' | '.join(terms)
+    return _field_expr(*x)
+
+
+def _resolve_ref(ref: str):
+    """Import object referenced as 'package.module:name'
+
+    The name may be a dotted path within the module. A reference
+    without ':' is split at its last dot.
+
+    """
+    if ':' in ref:
+        modname, qualname = ref.split(':', 1)
+    else:
+        modname, _, qualname = ref.rpartition('.')
+    obj = importlib.import_module(modname)
+    for attr in qualname.split('.'):
+        obj = getattr(obj, attr)
+    return obj
+
+
+_worker_parser = None
+
+
+def _init_worker(parser: Parser | str):
+    """Set the parser of a worker process of Parser.parse_parallel
+
+    """
+    global _worker_parser
+    if isinstance(parser, str):
+        parser = _resolve_ref(parser)
+        if not isinstance(parser, Parser):
+            parser = parser()
+    _worker_parser = parser
+
+
+def _parse_file_chunk(path: str, width: int, endian: str, start: int,
+                      end: int) -> list[list[dict, ...], ...]:
+    return [r for _, r in _worker_parser.iter_file(path, width, endian,
+                                                   start, end)]
+
+
+def _parse_buffer_chunk(chunk: bytes, width: int,
+                        endian: str) -> list[list[dict, ...], ...]:
+    return _worker_parser.parse_buffer(chunk, width, endian)
+
+
+def _ordered(job: tuple, size: int):
+    """Yield (offset, result) for results of a chunk job
+
+    """
+    offset, future = job
+    for r in future.result():
+        yield offset, r
+        offset += size
+
+
+def _bit_runs(bits: list[int, ...]) -> list[tuple[int, int, int], ...]:
+    """Split bit positions into runs of adjacent bits
+
+    Returns list of tuples (first bit, number of bits, position in slice)
+    for the bits in ascending order.
+
+    """
+    runs = []
+    pos = 0
+    for b in sorted(bits):
+        if runs and runs[-1][0] + runs[-1][1] == b:
+            runs[-1][1] += 1
+        else:
+            runs.append([b, 1, pos])
+        pos += 1
+    return [tuple(r) for r in runs]
+
+
+def _make_gather(bits: list[int, ...]):
+    """Make function that packs the given bits of a code into an integer
+
+    The lowest bit position ends up in bit 0 of the result.
+
+    """
+    return eval('lambda code: ' + _gather_expr(bits))
+
+
+def _gather_expr(bits: list[int, ...]) -> str:
+    """Make Python expression that packs the given bits of code
+
+    """
+    terms = []
+    for b, n, pos in _bit_runs(bits):
+        t = '(code >> {}) & {}'.format(b, 2**n - 1) if b else \
+            'code & {}'.format(2**n - 1)
+        if pos:
+            t = '(({}) << {})'.format(t, pos)
+        else:
+            t = '({})'.format(t)
+        terms.append(t)
+    return ' | '.join(terms) or '0'
+
+
+def _choose_slice(entries: list[tuple, ...], width: int,
+                  nbits: int) -> list[int, ...]:
+    """Choose bits to index a dispatch table by
+
+    Bits are added one at a time, each time taking the bit that most
+    reduces the expected number of opcodes in a bucket. An opcode fixes
+    2**-n of the buckets if it has n fixed bits in the slice.
+
+    """
+    fixed = [0] * len(entries)
+    bits = []
+    cost = len(entries)
+    while len(bits) < min(nbits, width):
+        best = None
+        for b in range(width):
+            if b in bits:
+                continue
+            bit = 1 << b
+            c = sum(2.0**-(f + 1 if e[0] & bit else f)
+                    for e, f in zip(entries, fixed))
+            if best is None or c < best[0]:
+                best = (c, b)
+        if best is None or best[0] >= cost:
+            break
+        cost, b = best
+        bits.append(b)
+        fixed = [f + 1 if e[0] & (1 << b) else f
+                 for e, f in zip(entries, fixed)]
+    return sorted(bits)
+
+
+def _build_table(entries: list[tuple, ...], bits: list[int, ...],
+                 gather) -> list[list[tuple, ...], ...]:
+    """Build dispatch table indexed by the bits of a slice
+
+    An entry goes into every bucket whose slice value the opcode
+    pattern can match, which is the overlap test of Opcode.intersect
+    restricted to the slice. Buckets with the same entries share a leaf.
+
+    """
+    nb = len(bits)
+    buckets = [[] for _ in range(2**nb)]
+    top = 2**nb - 1
+    for k, e in enumerate(entries):
+        fixed = gather(e[0])
+        value = gather(e[1]) & fixed
+        free = top ^ fixed
+        sub = free
+        while True:
+            buckets[value | sub].append(k)
+            if sub == 0:
+                break
+            sub = (sub - 1) & free
+    leaves = {}
+    table = []
+    for b in buckets:
+        key = tuple(b)
+        leaf = leaves.get(key)
+        if leaf is None:
+            leaf = leaves[key] = _make_leaf([entries[k] for k in key])
+        table.append(leaf)
+    return table
+
+
 class Parser():
     """Opcode parser
 
+    :param cache_size: Number of instruction words whose results are kept
+        in a least-recently-used cache, 0 for no cache. Cached results are
+        returned as the same list and dictionary objects each time, and
+        should not be modified.
+    :param result_type: 'dict' for interpretations as dictionaries made by
+        Opcode.decode, 'record' for compact records made by
+        Opcode.decode_record. Filters that modify their dictionary need
+        'dict'.
+
     """
-    def __init__(self):
+    def __init__(self, cache_size: int = 0, result_type: str = 'dict'):
         """Constructor method
 
         """
+        if result_type not in ('dict', 'record'):
+            raise Exception("unknown result type \"{}\"".format(result_type))
+        self.result_type = result_type
         self.opcodes = []
+        self._names = set()
+        self._compile_args = None
+        self._tree = None
+        self._table = None
+        self._gather = None
+        self._cache_size = cache_size
+        self._cache = collections.OrderedDict() if cache_size > 0 else None
+        self._hits = self._misses = self._evictions = 0
+        self._profile = False
+        self._profile_data = None
+        self._weights = None
+        self._set_core(self._parse_linear)
+
+    def __getstate__(self):
+        # compiled indexes hold bound methods and generated functions,
+        # they are rebuilt after unpickling instead
+        return {'opcodes': self.opcodes, 'compile_args': self._compile_args,
+                'cache_size': self._cache_size,
+                'result_type': self.result_type, 'weights': self._weights}
+
+    def __setstate__(self, state):
+        self.__init__(state['cache_size'], state['result_type'])
+        self.opcodes = state['opcodes']
+        for o in self.opcodes:
+            o[0]._parsers.add(self)
+            self._names.add(o[0].name)
+        self._compile_args = state['compile_args']
+        self._weights = state.get('weights')
+        self._invalidate()
 
     def __repr__(self):
         str = ''
         for o in self.opcodes:
             ocp = o[0]
             str += "{}, {}: ".format(ocp.name, o[1])
-            str += ', '.join(s for s in ocp.params)
+            str += ', '.join(s for s in ocp.fields())
             str += '\n'
         return str
 
@@ -223,11 +1246,13 @@ class Parser():
         If the name is already in use, an exception is raised.
 
         """
-        names = [o[0].name for o in self.opcodes]
-        if opc.name in names:
+        if opc.name in self._names:
             raise Exception("opcode name already exists")
         else:
             self.opcodes.append([opc, 0])
+            self._names.add(opc.name)
+            opc._parsers.add(self)
+            self._invalidate()
 
     def set_priority(self, name: str, pri: int):
         """Set priority of named opcode
@@ -236,6 +1261,7 @@ class Parser():
         for le in self.opcodes:
             if le[0].name == name:
                 le[1] = pri
+                self._invalidate()
                 break
 
     def get_priority(self, name: str) -> int | None:
@@ -254,11 +1280,761 @@ class Parser():
            an interpretation of the opcode
 
         """
+        return self._parse(code)
+
+    def compile(self, method: str = 'tree', leaf_size: int = 1,
+                bits: None | list[int, ...] = None, nbits: int = 10,
+                generate: bool = False):
+        """Compile opcode patterns into a dispatch index
+
+        With method 'tree' a decision tree is built. Each node of the tree
+        tests the single bit that best splits the opcodes that can still
+        match, so that parse only has to decode the few opcodes left in the
+        leaf it ends up in. Identical subtrees are shared. Bits that most
+        opcodes do not care about are not tested, and the size of the
+        tree is capped, so patterns with many don't care bits give larger
+        leaves rather than an exponentially large tree.
+
+        With method 'table' a dense table is built with one bucket for
+        each value of a slice of the instruction word. A bucket holds the
+        opcodes whose pattern can match the value of the slice, and parse
+        only decodes those. This is cheaper to build than the tree.
+
+        With generate set, the index is turned into Python source by
+        generate_decoder, and parse calls the generated function.
+
+        Once compiled, the index is rebuilt automatically the next time
+        parse is called after add or set_priority.
+
+        After optimize, opcodes of the same priority are tested in order of
+        how often they matched, and the tree is split for the words seen
+        most often.
+
+        :param method:    'tree' or 'table'
+        :param leaf_size: Tree only. Stop splitting when a leaf holds this
+                          many opcodes or fewer
+        :param bits:      Table only. Bit positions of the slice, e.g.
+                          list(range(20, 28)) + list(range(4, 8)). If not
+                          given, the slice is chosen from the opcodes.
+        :param nbits:     Table only. Maximum number of bits in the slice
+                          when it is chosen automatically
+        :param generate:  Parse with a generated decoder function
+
+        """
+        if method not in ('tree', 'table'):
+            raise Exception("unknown method \"{}\"".format(method))
+        self._compile_args = {'method': method, 'leaf_size': leaf_size,
+                              'bits': bits, 'nbits': nbits,
+                              'generate': generate}
+        entries = self._entries()
+        width = max((len(o[0]) for o in self.opcodes), default=0)
+        self._tree = None
+        self._table = None
+        if method == 'tree':
+            weights = None
+            if self._weights is not None:
+                weights = [self._weights.get(self.opcodes[e[4]][0].name, 0)
+                           + 1 for e in entries]
+            self._tree = _build_tree(entries, width, leaf_size, weights)
+            self._set_core(self._parse_tree)
+        else:
+            if bits is None:
+                bits = _choose_slice(entries, width, nbits)
+            self._gather = _make_gather(bits)
+            self._table = _build_table(entries, bits, self._gather)
+            self._table_bits = sorted(bits)
+            self._set_core(self._parse_table)
+        if generate:
+            self._set_core(self._generate(None))
+
+    def generate_decoder(self, path: None | str = None):
+        """Generate a specialized decoder function
+
+        Python source is generated for a function decode(code) that returns
+        the same list as parse(code). Masks, patterns and shifts are
+        inlined as constants, and the tests of the compiled index, or of
+        the linear scan if the parser is not compiled, are unrolled.
+
+        If a path is given, the source is also written to that file as a
+        module that can be imported without the opcode definitions.
+        Filters are then imported by name, so they must be functions
+        defined at the top level of a module. A decoder of dictionaries
+        does not need ocparse either, while a decoder of records imports
+        ocparse for the record classes, so that its results are the same
+        records parse returns.
+
+        :param path: Name of file to write the source to
+        :returns: The decode function
+
+        """
+        if self._compile_args is not None:
+            self._ready_core()
+        return self._generate(path)
+
+    def _generate(self, path: None | str):
+        src, ns = self._decoder_source(path is not None)
+        if path is not None:
+            with open(path, 'w') as file:
+                file.write(src)
+        exec(compile(src, path or '<ocparse decoder>', 'exec'), ns)
+        return ns['decode']
+
+    def _decoder_source(self, by_name: bool) -> tuple[str, dict]:
+        """Make source of decoder function and its global namespace
+
+        :param by_name: Import filters by name in the source
+
+        """
+        width = max((len(o[0]) for o in self.opcodes), default=0)
+        ns = {}
+        head = []
+        funcs = []
+        filters = {}
+        names = {}
+        records = []
+        rnames = {}
+        rhead = []
+        extractors, keys = self._field_table()
+
+        def filter_name(opc):
+            f = opc.param_filter
+            if f is _no_filter:
+                return None
+            if id(f) not in filters:
+                name = filters[id(f)] = '_f{}'.format(len(filters))
+                ns[name] = f
+                if by_name:
+                    ref = _func_ref(f)
+                    if ref is None:
+                        raise Exception("filter of opcode \"{}\" can not be "
+                                        "imported by name".format(opc.name))
+                    mod, qual = ref.split(':')
+                    head.append("{} = importlib.import_module({!r}).{}".format(
+                        name, mod, qual))
+            return filters[id(f)]
+
+        def record_name(opc):
+            name = '_r{}'.format(len(records))
+            records.append(name)
+            fields = opc.fields()
+            ns[name] = _record_class(opc.name, fields)
+            rhead.append("{} = ocparse._record_class({!r}, {!r})".format(
+                name, opc.name, fields))
+            return name
+
+        def match(e, ind, rival_of=None, avail=frozenset()):
+            mask, pattern, decode, pri, idx = e[:5]
+            opc = self.opcodes[idx][0]
+            sp = ' ' * ind
+            lines = [sp + "if (code & {:#x}) == {:#x}:".format(
+                mask, pattern & mask)]
+            if rival_of is None and e[5]:
+                # fields shared with rivals are extracted once into locals
+                shared = set(keys[idx]) & {k for r in e[5]
+                                           for k in keys[r[4]]}
+                for k in keys[idx]:
+                    if k in shared and k not in avail:
+                        lines.append(sp + "    _x{} = {}".format(
+                            k, _extractor_expr(extractors[k])))
+                avail = avail | shared
+            exprs = ["_x{}".format(k) if k in avail
+                     else _extractor_expr(extractors[k]) for k in keys[idx]]
+            f = decode.__self__.param_filter
+            if f.__class__ is Constraint:
+                # checked on the extracted fields before d is made
+                lines.append(sp + "    if {}:".format(f._source(
+                    dict(zip(opc.fields(), exprs)).__getitem__)))
+                sp += '    '
+                f = None
+            if self.result_type == 'record':
+                if idx not in rnames:
+                    rnames[idx] = record_name(opc)
+                fields = ''.join("{}, ".format(x) for x in exprs)
+                lines.append(sp + "    d = _new({}, ({}))".format(
+                    rnames[idx], fields))
+            else:
+                fields = ''.join(", {!r}: {}".format(k, x)
+                                 for k, x in zip(opc.fields(), exprs))
+                lines.append(sp + "    d = {{'name': {!r}{}}}".format(
+                    opc.name, fields))
+            if f is not None:
+                f = filter_name(decode.__self__)
+            if f is not None:
+                lines.append(sp + "    if {}(d):".format(f))
+                sp += '    '
+            if rival_of is None:
+                lines += hit(e, len(sp) + 4, avail)
+            elif rival_of == 'list':
+                lines.append(sp + "    r.append(d)")
+            else:
+                lines.append(sp + "    h.append(({}, {}, d))".format(
+                    pri, idx))
+            return lines
+
+        def hit(e, ind, avail):
+            sp = ' ' * ind
+            pri, idx, rivals = e[3], e[4], e[5]
+            if not rivals:
+                return [sp + "return [d]"]
+            # rivals are in weight order after optimize, so hits can only
+            # be appended if that is also the order they were added in
+            idxs = [idx] + [r[4] for r in rivals]
+            if all(r[3] == pri for r in rivals) and idxs == sorted(idxs):
+                lines = [sp + "r = [d]"]
+                for r in rivals:
+                    lines += match(r, ind, 'list', avail)
+                return lines + [sp + "return r"]
+            lines = [sp + "h = [({}, {}, d)]".format(pri, idx)]
+            for r in rivals:
+                lines += match(r, ind, 'hits', avail)
+            return lines + [
+                sp + "best = min(x[0] for x in h)",
+                sp + "return [x[2] for x in sorted(h) if x[0] == best]"]
+
+        def leaf_name(leaf):
+            if id(leaf) not in names:
+                name = names[id(leaf)] = '_leaf{}'.format(len(names))
+                lines = ["def {}(code):".format(name)]
+                for e in leaf:
+                    lines += match(e, 4)
+                funcs.append('\n'.join(lines + ["    return []"]))
+            return names[id(leaf)]
+
+        refs = collections.Counter()
+
+        def count(node):
+            refs[id(node)] += 1
+            if refs[id(node)] == 1 and node.__class__ is tuple:
+                count(node[1])
+                count(node[2])
+
+        def node_lines(node, ind, depth):
+            sp = ' ' * ind
+            if node.__class__ is not tuple:
+                if not node:
+                    return [sp + "return []"]
+                return [sp + "return {}(code)".format(leaf_name(node))]
+            if depth and (refs[id(node)] > 1 or depth >= 32):
+                if id(node) not in names:
+                    name = names[id(node)] = '_node{}'.format(len(names))
+                    funcs.append('\n'.join(["def {}(code):".format(name)] +
+                                           node_lines(node, 4, 0)))
+                return [sp + "return {}(code)".format(names[id(node)])]
+            return ([sp + "if code & {:#x}:".format(node[0])] +
+                    node_lines(node[2], ind + 4, depth + 1) +
+                    node_lines(node[1], ind, depth + 1))
+
+        body = ["def decode(code):",
+                "    if code >> {}:".format(width),
+                "        return []"]
+        if self._compile_args is None:
+            leaf = _make_leaf(self._entries())
+            body += node_lines(leaf, 4, 0)
+        elif self._tree is not None:
+            count(self._tree)
+            body += node_lines(self._tree, 4, 0)
+        else:
+            table = ', '.join(leaf_name(leaf) if leaf else '_none'
+                              for leaf in self._table)
+            funcs.append("def _none(code):\n    return []")
+            funcs.append("_table = ({},)".format(table))
+            body.append("    return _table[{}](code)".format(
+                _gather_expr(self._table_bits)))
+        src = ['"""Decoder generated by ocparse.Parser.generate_decoder',
+               '',
+               '   decode(code) returns the same list of interpretations as',
+               '   Parser.parse(code) of the parser it was generated from.',
+               '',
+               '"""']
+        if head:
+            src += ['import importlib', ''] + head
+        if records:
+            ns['_new'] = tuple.__new__
+            src += ['import ocparse', '', '_new = tuple.__new__'] + rhead
+        src += [''] + ['\n' + f + '\n' for f in funcs]
+        src += ['', '\n'.join(body), '']
+        return '\n'.join(src), ns
+
+    def index_stats(self) -> dict:
+        """Return statistics of the compiled dispatch index
+
+        The sizes count the opcodes in the leaves of a tree or the
+        buckets of a table, i.e. the opcodes that parse may have to
+        decode. The average is taken over all leaves/buckets. 'fields'
+        counts the fields of all opcodes and 'extractors' the distinct
+        (mask, shift) pairs among them.
+
+        """
+        if self._compile_args is None:
+            raise Exception("parser has not been compiled")
+        self._ready_core()
+        extractors, keys = self._field_table()
+        fields = {'fields': sum(len(k) for k in keys),
+                  'extractors': len(extractors)}
+        if self._tree is not None:
+            leaves = []
+            depths = {}
+
+            def walk(node):
+                if id(node) not in depths:
+                    if node.__class__ is tuple:
+                        depths[id(node)] = 1 + max(walk(node[1]),
+                                                   walk(node[2]))
+                    else:
+                        leaves.append(len(node))
+                        depths[id(node)] = 0
+                return depths[id(node)]
+
+            depth = walk(self._tree)
+            return {'method': 'tree', 'leaves': len(leaves), 'depth': depth,
+                    'max': max(leaves), 'mean': sum(leaves)/len(leaves),
+                    **fields}
+        sizes = [len(b) for b in self._table]
+        return {'method': 'table', 'bits': self._table_bits,
+                'buckets': len(sizes), 'max': max(sizes),
+                'mean': sum(sizes)/len(sizes), **fields}
+
+    def _field_table(self) -> tuple[list[tuple[int, int], ...], list]:
+        """Return the distinct field extractors of the opcodes
+
+        Fields with the same mask and shift, like the condition field of
+        most ARM opcodes, share one extractor whatever their names.
+
+        :returns: Tuple (extractors, keys). extractors is a list of
+                  (mask, rshift) pairs, and segment lists of split fields,
+                  and keys[i] holds for each field of opcode i, in order,
+                  the number of its extractor.
+
+        """
+        number = {}
+        keys = []
+        for opc, pri in self.opcodes:
+            keys.append(tuple(number.setdefault(p, len(number))
+                              for p in itertools.chain(
+                                  opc.params.values(),
+                                  opc.segments.values())))
+        return list(number), keys
+
+    def _entries(self) -> list[tuple, ...]:
+        """Return opcodes as dispatch entries in priority order
+
+        An entry is a tuple (mask, pattern, decode, priority, index),
+        where decode is the decode or decode_record method of the opcode.
+        The mask also covers the bits above the length of the opcode,
+        which must be zero for the opcode to match. Entries of the same
+        priority are ordered by the weights from optimize, if any, and
+        then in the order they were added.
+
+        An opcode whose filter is a Constraint gets one entry for each
+        cube of field values the constraint allows, and decode is then
+        the method of a copy without filter. If that takes too many
+        entries, the bits common to the cubes are added to the mask and
+        pattern of a single entry that still checks the constraint.
+
+        """
+        width = max((len(o[0]) for o in self.opcodes), default=0)
+        top = 2**width - 1
+        record = self.result_type == 'record'
+        entries = []
+        for idx, (opc, pri) in enumerate(self.opcodes):
+            mask = opc.mask | (top ^ (2**len(opc) - 1))
+            if opc.param_filter.__class__ is Constraint:
+                cubes, exact = opc.param_filter._fold(opc)
+                dec = opc._unfiltered() if exact else opc
+                decode = dec.decode_record if record else dec.decode
+                for cm, cp in cubes:
+                    entries.append((mask | cm, opc.pattern | cp, decode,
+                                    pri, idx))
+                continue
+            decode = opc.decode_record if record else opc.decode
+            entries.append((mask, opc.pattern, decode, pri, idx))
+        weights = self._weights
+        if weights is None:
+            entries.sort(key=lambda e: (e[3], e[4]))
+        else:
+            entries.sort(key=lambda e: (
+                e[3], -weights.get(self.opcodes[e[4]][0].name, 0), e[4]))
+        return entries
+
+    def dump(self, path: str):
+        """Save parser with its compiled index to a file
+
+        The file holds the masks, patterns, fields and priorities of the
+        opcodes and the compiled index, so that load does not have to
+        redo any of that work. It is written with marshal and can be read
+        by the same version of Python. Filters are stored by name, so they
+        must be functions defined at the top level of a module, or
+        Constraints, which are stored as data.
+
+        :param path: Name of file
+
+        """
+        opcodes = []
+        for opc, pri in self.opcodes:
+            ref = None
+            if opc.param_filter.__class__ is Constraint:
+                ref = opc.param_filter._tree
+            elif opc.param_filter is not _no_filter:
+                ref = _func_ref(opc.param_filter)
+                if ref is None:
+                    raise Exception("filter of opcode \"{}\" can not be "
+                                    "imported by name".format(opc.name))
+            opcodes.append((opc.name, opc.pattern_str, opc.pattern, opc.mask,
+                            opc.params, ref, pri, opc.segments))
+        index = None
+        if self._compile_args is not None:
+            self._ready_core()
+            index = self._dump_index()
+        data = {'format': 'ocparse.Parser', 'version': 2,
+                'cache_size': self._cache_size,
+                'result_type': self.result_type, 'opcodes': opcodes,
+                'compile_args': self._compile_args, 'index': index,
+                'weights': self._weights}
+        with open(path, 'wb') as file:
+            marshal.dump(data, file)
+
+    @classmethod
+    def load(cls, path: str) -> 'Parser':
+        """Load parser saved by dump
+
+        :param path: Name of file
+        :returns: The parser
+
+        """
+        with open(path, 'rb') as file:
+            data = marshal.load(file)
+        if not isinstance(data, dict) or \
+                data.get('format') != 'ocparse.Parser':
+            raise Exception("{} is not a saved parser".format(path))
+        if data['version'] not in (1, 2):
+            raise Exception("unsupported version of saved parser")
+        parser = cls(data['cache_size'], data.get('result_type', 'dict'))
+        for name, pstr, pattern, mask, params, ref, pri, *segs in \
+                data['opcodes']:
+            if ref is None:
+                f = _no_filter
+            elif ref.__class__ is tuple:
+                f = Constraint(ref)
+            else:
+                f = _resolve_ref(ref)
+            opc = Opcode._make(name, pstr, pattern, mask, params, f,
+                               segs[0] if segs else None)
+            opc._parsers.add(parser)
+            parser.opcodes.append([opc, pri])
+            parser._names.add(name)
+        parser._weights = data.get('weights')
+        if data['index'] is not None:
+            parser._load_index(data['compile_args'], data['index'],
+                               data['version'])
+        return parser
+
+    def _dump_index(self) -> tuple:
+        """Return compiled index as data that marshal can save
+
+        A leaf becomes a list of (entry number, rival entry numbers),
+        numbered in the order of _entries. Tree nodes are listed children
+        first as (bit, zero, one), where a child k >= 0 is node k and a
+        child k < 0 is leaf ~k.
+
+        """
+        leaves = {}
+        nodes = {}
+        number = {(e[4], e[0], e[1]): k
+                  for k, e in enumerate(self._entries())}
+
+        def leaf_no(leaf):
+            if id(leaf) not in leaves:
+                leaves[id(leaf)] = (len(leaves), [
+                    (number[e[4], e[0], e[1]],
+                     [number[r[4], r[0], r[1]] for r in e[5]])
+                    for e in leaf])
+            return ~leaves[id(leaf)][0]
+
+        def node_no(node):
+            if node.__class__ is not tuple:
+                return leaf_no(node)
+            if id(node) not in nodes:
+                n0 = node_no(node[1])
+                n1 = node_no(node[2])
+                nodes[id(node)] = (len(nodes), (node[0], n0, n1))
+            return nodes[id(node)][0]
+
+        if self._tree is not None:
+            root = node_no(self._tree)
+            index = ('tree', root, [n[1] for n in nodes.values()])
+        else:
+            index = ('table', self._table_bits,
+                     [leaf_no(leaf) for leaf in self._table])
+        return index + ([leaf[1] for leaf in leaves.values()],)
+
+    def _load_index(self, compile_args: dict, index: tuple,
+                    version: int = 2):
+        """Restore compiled index saved by _dump_index
+
+        Version 1 files number the entries by opcode index.
+
+        """
+        self._compile_args = compile_args
+        entries = self._entries()
+        if version == 1:
+            entries = {e[4]: e for e in entries}
+        leaves = [[entries[k] + (tuple(entries[r] for r in rivals),)
+                   for k, rivals in leaf] for leaf in index[-1]]
+        if index[0] == 'tree':
+            nodes = []
+            for bit, n0, n1 in index[2]:
+                nodes.append((bit, nodes[n0] if n0 >= 0 else leaves[~n0],
+                              nodes[n1] if n1 >= 0 else leaves[~n1]))
+            root = index[1]
+            self._tree = nodes[root] if root >= 0 else leaves[~root]
+            self._set_core(self._parse_tree)
+        else:
+            self._table_bits = index[1]
+            self._gather = _make_gather(index[1])
+            self._table = [leaves[~k] for k in index[2]]
+            self._set_core(self._parse_table)
+        if compile_args['generate']:
+            self._set_core(self._generate(None))
+
+    def cache_info(self) -> dict:
+        """Return statistics of the decode cache
+
+        """
+        return {'size': len(self._cache) if self._cache is not None else 0,
+                'max_size': self._cache_size, 'hits': self._hits,
+                'misses': self._misses, 'evictions': self._evictions}
+
+    def _invalidate(self):
+        """Forget decodings after opcodes have been changed
+
+        Clears the cache and makes parse rebuild the compiled index
+        before its next use.
+
+        """
+        if self._cache is not None:
+            self._cache.clear()
+        if self._compile_args is not None:
+            self._set_core(self._parse_recompile)
+
+    def _set_core(self, core):
+        """Set the function that parse uses when the cache misses
+
+        """
+        self._core = core
+        if self._profile:
+            self._parse = self._parse_profiled
+        else:
+            self._parse = self._parse_cached if self._cache is not None \
+                else core
+
+    def profile(self, enable: bool = True):
+        """Turn profiling of parse on or off
+
+        While profiling, parse goes through a separate instrumented path
+        that evaluates the same opcodes as the current index or linear
+        scan and counts for each opcode the decode attempts, the pattern
+        matches, the calls and rejections of its parameter filter and the
+        time spent in the filter. It also counts how many opcodes each
+        word was tested against and how long each word took. The cache is
+        not used while profiling. Turning profiling on clears earlier
+        statistics, turning it off keeps them for profile_stats.
+        Without profiling, parse runs exactly as before.
+
+        """
+        if enable:
+            self._profile_data = {'opcodes': {}, 'words': 0, 'total_ns': 0,
+                                  'candidates': collections.Counter(),
+                                  'ns': collections.Counter()}
+        self._profile = enable
+        self._set_core(self._core)
+
+    def profile_stats(self) -> dict:
+        """Return statistics collected by profiling
+
+        The dictionary can be written with json.dump. It has the keys
+
+        * opcodes: for each opcode name a dictionary with the numbers of
+          attempts, matches, filter_calls and filter_rejections, and
+          filter_ns, the time in the filter in nanoseconds. Filter calls
+          only count opcodes with a parameter filter.
+        * candidates: number of words by the number of opcodes tested
+        * ns_per_word: number of words by parse time, in buckets of
+          powers of two nanoseconds, keyed by the bucket's upper bound
+        * words, total_ns: number of words parsed and their total time
+
+        """
+        stats = self._profile_data
+        if stats is None:
+            return {}
+        keys = ('attempts', 'matches', 'filter_calls', 'filter_rejections',
+                'filter_ns')
+        return {'opcodes': {name: dict(zip(keys, st))
+                            for name, st in stats['opcodes'].items()},
+                'candidates': dict(sorted(stats['candidates'].items())),
+                'ns_per_word': dict(sorted(stats['ns'].items())),
+                'words': stats['words'], 'total_ns': stats['total_ns']}
+
+    def optimize(self, sample=None, profile: None | dict | str = None
+                 ) -> dict:
+        """Order evaluation of opcodes by how often they match
+
+        The words of sample are parsed with profiling, and each opcode is
+        weighted by how often it was accepted. Within each priority,
+        opcodes are then tested in order of decreasing weight, and a tree
+        index is split for the most frequent opcodes. Results, and the
+        order of several interpretations, are unchanged.
+        The index is recompiled. A parser that was not compiled is
+        compiled as a table without slice, a single list that stops at the
+        first opcode that matches and the few opcodes that could also
+        match the same word.
+
+        :param sample:  Iterable of instruction words
+        :param profile: Weights to use instead of a sample, as returned by
+                        optimize or as name of a file written by
+                        save_profile
+        :returns: Dictionary of opcode name to weight
+
+        """
+        if isinstance(profile, (str, os.PathLike)):
+            with open(profile) as file:
+                profile = json.load(file)
+        if profile is None:
+            enabled, data = self._profile, self._profile_data
+            self.profile()
+            try:
+                parse = self._ready()
+                for code in sample if sample is not None else ():
+                    parse(code)
+                stats = self._profile_data['opcodes']
+            finally:
+                self._profile, self._profile_data = enabled, data
+                self._set_core(self._core)
+            profile = {name: st[1] - st[3] for name, st in stats.items()}
+        self._weights = dict(profile)
+        if self._compile_args is None:
+            self.compile('table', bits=[])
+        else:
+            self.compile(**self._compile_args)
+        return self._weights
+
+    def save_profile(self, path: str):
+        """Save the weights from optimize as JSON
+
+        :param path: Name of file
+
+        """
+        with open(path, 'w') as file:
+            json.dump(self._weights or {}, file, indent=1)
+
+    def _parse_profiled(self, code: int) -> list[dict, ...]:
+        t = time.perf_counter_ns()
+        self._ready_core()
+        stats = self._profile_data
+        ops = stats['opcodes']
+        record = self.result_type == 'record'
+        n = 0
+        if self._tree is not None or self._table is not None:
+            if self._tree is not None:
+                node = self._tree
+                while node.__class__ is tuple:
+                    node = node[2] if code & node[0] else node[1]
+            else:
+                node = self._table[self._gather(code)]
+            hits = []
+            for e in node:
+                opc = e[2].__self__
+                st = ops.get(opc.name)
+                if st is None:
+                    st = ops[opc.name] = [0, 0, 0, 0, 0]
+                n += 1
+                d = opc._decode_profiled(code, record, st, e[0], e[1])
+                if d is not None:
+                    hits.append((e[3], e[4], d))
+                    break
+            if hits:
+                for r in node[n - 1][5]:
+                    opc = r[2].__self__
+                    st = ops.get(opc.name)
+                    if st is None:
+                        st = ops[opc.name] = [0, 0, 0, 0, 0]
+                    n += 1
+                    d = opc._decode_profiled(code, record, st, r[0], r[1])
+                    if d is not None:
+                        hits.append((r[3], r[4], d))
+            best = min((h[0] for h in hits), default=None)
+            ocd = [h[2] for h in sorted(hits) if h[0] == best]
+        else:
+            ocd = []
+            pri = max(o[1] for o in self.opcodes)+1
+            for opc, p in self.opcodes:
+                if (len(ocd) > 0 and p <= pri) or len(ocd) == 0:
+                    st = ops.get(opc.name)
+                    if st is None:
+                        st = ops[opc.name] = [0, 0, 0, 0, 0]
+                    n += 1
+                    d = opc._decode_profiled(code, record, st)
+                    if d is not None and p < pri:
+                        ocd = [d]
+                        pri = p
+                    elif d is not None:
+                        ocd.append(d)
+        ns = time.perf_counter_ns() - t
+        stats['candidates'][n] += 1
+        stats['ns'][1 << ns.bit_length()] += 1
+        stats['words'] += 1
+        stats['total_ns'] += ns
+        return ocd
+
+    def _parse_cached(self, code: int) -> list[dict, ...]:
+        cache = self._cache
+        ocd = cache.get(code)
+        if ocd is not None:
+            cache.move_to_end(code)
+            self._hits += 1
+            return ocd
+        self._misses += 1
+        ocd = cache[code] = self._core(code)
+        if len(cache) > self._cache_size:
+            cache.popitem(last=False)
+            self._evictions += 1
+        return ocd
+
+    def _parse_recompile(self, code: int) -> list[dict, ...]:
+        return self._ready_core()(code)
+
+    def _ready_core(self):
+        """Rebuild compiled index if needed and return parse core function
+
+        """
+        if self._core == self._parse_recompile:
+            self.compile(**self._compile_args)
+        return self._core
+
+    def _ready(self):
+        """Rebuild compiled index if needed and return parse function
+
+        For loops that look up the parse function once.
+
+        """
+        self._ready_core()
+        return self._parse
+
+    def _parse_tree(self, code: int) -> list[dict, ...]:
+        node = self._tree
+        while node.__class__ is tuple:
+            node = node[2] if code & node[0] else node[1]
+        return _eval_leaf(node, code)
+
+    def _parse_table(self, code: int) -> list[dict, ...]:
+        return _eval_leaf(self._table[self._gather(code)], code)
+
+    def _parse_linear(self, code: int) -> list[dict, ...]:
         ocd = []
         pri = max(o[1] for o in self.opcodes)+1
+        record = self.result_type == 'record'
         for o in self.opcodes:
             if (len(ocd) > 0 and o[1] <= pri) or len(ocd) == 0:
-                d = o[0].decode(code)
+                d = o[0].decode_record(code) if record else o[0].decode(code)
                 if d is not None and o[1] < pri:
                     ocd = [d]
                     pri = o[1]
@@ -266,6 +2042,204 @@ class Parser():
                     ocd.append(d)
         return ocd
 
+    def parse_buffer(self, buf, width: int = 32, endian: str = 'little',
+                     offset: int = 0, stride: None | int = None
+                     ) -> list[list[dict, ...], ...]:
+        """Parse all instruction words in a buffer
+
+        The buffer is read in place through a memoryview, so bytes,
+        bytearray, memoryview, array.array and mmap objects are parsed
+        without being copied. A trailing part too short for a word is
+        ignored.
+
+        :param buf:    Object supporting the buffer protocol
+        :param width:  Number of bits per instruction word, multiple of 8
+        :param endian: Byte order of words, 'little' or 'big'
+        :param offset: Byte offset of first word
+        :param stride: Bytes from start of one word to the next.
+                       Defaults to the size of a word.
+        :returns: List with the result of parse for each word
+
+        """
+        parse = self._ready()
+        with memoryview(buf) as mv, mv.cast('B') as b:
+            return [parse(w) for w in _iter_words(b, width, endian, offset,
+                                                  len(b), stride)]
+
+    def iter_file(self, path: str, width: int = 32, endian: str = 'little',
+                  start: int = 0, end: None | int = None,
+                  chunk_words: int = 65536,
+                  skip: list[tuple[int, int], ...] = ()):
+        """Parse instruction words of a binary file lazily
+
+        The file is memory mapped and read chunk_words words at a time,
+        so memory use does not grow with the size of the file. Words that
+        would overlap a skipped region are not parsed, and after a skipped
+        region words are read from its end.
+
+        :param path:        Name of file
+        :param width:       Number of bits per instruction word,
+                            multiple of 8
+        :param endian:      Byte order of words, 'little' or 'big'
+        :param start:       Byte offset to start, or resume, from
+        :param end:         Byte offset to stop at, end of file if None
+        :param chunk_words: Number of words read from the file at a time
+        :param skip:        List of (start, end) byte ranges to skip,
+                            e.g. data sections and padding
+        :returns: Generator of tuples (byte offset, result of parse)
+
+        """
+        size = width // 8
+        parse = self._ready()
+        with open(path, 'rb') as f:
+            if f.seek(0, 2) == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if end is None or end > len(mm):
+                    end = len(mm)
+                for a, b in _regions(start, end, skip):
+                    while a + size <= b:
+                        stop = min(b, a + chunk_words * size)
+                        with memoryview(mm) as mv:
+                            words = list(_iter_words(mv, width, endian,
+                                                     a, stop))
+                        for w in words:
+                            yield a, parse(w)
+                            a += size
+                        if not words:
+                            break
+
+    def parse_parallel(self, source, workers: None | int = None,
+                       width: int = 32, endian: str = 'little',
+                       chunk_words: int = 65536,
+                       max_pending: None | int = None,
+                       spec: None | str = None):
+        """Parse a buffer or file with a pool of worker processes
+
+        The source is split into chunks of whole words that are parsed in
+        parallel, and results are yielded in address order. The parser is
+        sent to each worker once. A file given by name is memory mapped by
+        the workers themselves, so only byte offsets are sent to them.
+
+        Parsers whose opcode filters can not be pickled, e.g. lambdas, can
+        be shipped by reference instead: spec names a module attribute
+        holding the parser, or a function returning it, as
+        'package.module:name'. The workers import it.
+
+        :param source:      Object supporting the buffer protocol or
+                            name of file
+        :param workers:     Number of processes, number of CPUs if None
+        :param width:       Number of bits per instruction word,
+                            multiple of 8
+        :param endian:      Byte order of words, 'little' or 'big'
+        :param chunk_words: Number of words in each chunk
+        :param max_pending: Maximum number of chunks submitted and not yet
+                            yielded. Defaults to twice the number of
+                            workers.
+        :param spec:        Reference to parser for the workers to import
+        :returns: Generator of tuples (byte offset, result of parse)
+
+        """
+        if width % 8 or width <= 0:
+            raise Exception("width must be a positive multiple of 8")
+        size = width // 8
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if max_pending is None:
+            max_pending = 2 * workers
+        step = chunk_words * size
+        init = self if spec is None else spec
+        with concurrent.futures.ProcessPoolExecutor(
+                workers, initializer=_init_worker, initargs=(init,)) as ex:
+            pending = collections.deque()
+            if isinstance(source, (str, os.PathLike)):
+                path = os.fspath(source)
+                total = os.path.getsize(path)
+                for a in range(0, total, step):
+                    pending.append((a, ex.submit(
+                        _parse_file_chunk, path, width, endian, a,
+                        min(a + step, total))))
+                    while len(pending) >= max_pending:
+                        yield from _ordered(pending.popleft(), size)
+            else:
+                with memoryview(source) as mv, mv.cast('B') as b:
+                    total = len(b) - len(b) % size
+                    for a in range(0, total, step):
+                        chunk = bytes(b[a:min(a + step, total)])
+                        pending.append((a, ex.submit(
+                            _parse_buffer_chunk, chunk, width, endian)))
+                        while len(pending) >= max_pending:
+                            yield from _ordered(pending.popleft(), size)
+            while pending:
+                yield from _ordered(pending.popleft(), size)
+
+    def classify_array(self, words) -> tuple:
+        """Classify an array of instruction words with NumPy
+
+        Each opcode pattern is tested against all words at once. A
+        Constraint filter is evaluated on the fields of all matching
+        words at once, too. Opcodes with any other parameter filter are
+        decoded one by one for the words that match their pattern.
+        Requires NumPy.
+
+        :param words: NumPy array of unsigned integers
+        :returns: Tuple (index, ambiguous) of arrays. index holds the
+                  index into self.opcodes of the first interpretation
+                  of each word, or -1 if there is none.
+                  ambiguous is True where parse would return more than
+                  one interpretation.
+
+        """
+        w = _as_uint64(words)
+        width = max((len(o[0]) for o in self.opcodes), default=0)
+        if width > 64:
+            raise Exception("opcodes wider than 64 bits")
+        high = 2**64 - 2**width
+        index = np.full(w.shape, -1, dtype=np.int64)
+        best = np.zeros(w.shape, dtype=np.int64)
+        count = np.zeros(w.shape, dtype=np.int64)
+        # in the order of interpretations, not the order of optimize
+        entries = sorted(self._entries(), key=lambda e: (e[3], e[4]))
+        for mask, pattern, decode, pri, idx in entries:
+            match = ((w ^ np.uint64(pattern)) & np.uint64(mask | high)) == 0
+            match &= (index == -1) | (best == pri)
+            opc = decode.__self__
+            if opc.param_filter.__class__ is Constraint:
+                match &= opc.param_filter._array(
+                    lambda k: _field_array(w, opc._extractor(k)))
+            elif opc.param_filter is not _no_filter:
+                for pos in np.flatnonzero(match):
+                    if decode(int(w.flat[pos])) is None:
+                        match.flat[pos] = False
+            new = match & (index == -1)
+            index[new] = idx
+            best[new] = pri
+            count[match] += 1
+        return index, count > 1
+
+    def fields_array(self, words, name: str) -> dict:
+        """Extract the fields of an opcode from an array of words
+
+        The words are not checked against the pattern of the opcode.
+        Requires NumPy.
+
+        :param words: NumPy array of unsigned integers
+        :param name:  Name of opcode
+        :returns: Dictionary with an array of values for each field
+
+        """
+        w = _as_uint64(words)
+        for opc, pri in self.opcodes:
+            if opc.name == name:
+                break
+        else:
+            raise Exception("no opcode named \"{}\"".format(name))
+        dtype = np.asarray(words).dtype
+        if dtype.kind != 'u':
+            dtype = np.uint64
+        return {k: _field_array(w, opc._extractor(k)).astype(dtype)
+                for k in opc.fields()}
+
     def ambiguity_matrix(self) -> list[list[int, ...], ...]:
         """Return list of lists whose [i][j]-element is nonzero if
         opcode i and j can not be distinguished
@@ -279,10 +2253,10 @@ class Parser():
         """Return list of pairs of names of ambigous opcodes
 
         """
-        n = len(self.opcodes)
         o = self.opcodes
-        return [(o[i1][0].name, o[i2][0].name) for i1 in range(n)
-                for i2 in range(i1+1, n) if o[i1][0].intersect(o[i2][0])]
+        pairs = _ambiguous_pairs([oc[0].mask for oc in o],
+                                 [oc[0].pattern for oc in o])
+        return [(o[i1][0].name, o[i2][0].name) for i1, i2 in pairs]
 
     def __str__(self):
         s = ''
@@ -291,9 +2265,516 @@ class Parser():
         return s
 
 
+class StreamParser():
+    """Parser for streams of instructions of different widths
+
+    The stream is read in units of unit bits, e.g. halfwords for Thumb.
+    The top prefix_bits bits of the first unit of an instruction select its
+    width in the widths table, and the instruction is parsed by the parser
+    for that width. The units of an instruction are combined with the
+    first unit as the most significant, as in Thumb-2.
+
+    :param parsers:     Dictionary of width in bits to Parser
+    :param widths:      Dictionary of prefix value to width in bits.
+                        Prefixes not in the table are one unit wide.
+    :param unit:        Number of bits per unit, multiple of 8
+    :param prefix_bits: Number of bits of the prefix
+
+    """
+    def __init__(self, parsers: dict, widths: dict, unit: int = 16,
+                 prefix_bits: int = 5):
+        """Constructor method
+
+        """
+        if unit % 8 or unit <= 0:
+            raise Exception("unit must be a positive multiple of 8")
+        for prefix, width in widths.items():
+            if width % unit or width <= 0:
+                raise Exception("width must be a multiple of unit")
+            if not 0 <= prefix < 2**prefix_bits:
+                raise Exception("prefix out of range")
+        self.parsers = parsers
+        self.widths = widths
+        self.unit = unit
+        self.prefix_bits = prefix_bits
+
+    @classmethod
+    def thumb(cls, parser16: Parser, parser32: Parser) -> 'StreamParser':
+        """Make stream parser for mixed Thumb and Thumb-2 code
+
+        Halfwords starting with 0b11101, 0b11110 or 0b11111 are the first
+        half of a 32-bit instruction.
+
+        """
+        return cls({16: parser16, 32: parser32},
+                   {0b11101: 32, 0b11110: 32, 0b11111: 32}, 16, 5)
+
+    def _dispatch(self) -> list[tuple[int, object], ...]:
+        """Return table of (units, parse function) indexed by prefix
+
+        """
+        parse = {w: p._ready() for w, p in self.parsers.items()}
+        table = []
+        for prefix in range(2**self.prefix_bits):
+            width = self.widths.get(prefix, self.unit)
+            if width not in parse:
+                raise Exception("no parser for width {}".format(width))
+            table.append((width // self.unit, parse[width]))
+        return table
+
+    def iter_buffer(self, buf, endian: str = 'little', offset: int = 0):
+        """Parse the instructions of a buffer lazily
+
+        The buffer is read in place in a single pass, one unit at a time.
+        An instruction cut off by the end of the buffer is ignored.
+
+        :param buf:    Object supporting the buffer protocol
+        :param endian: Byte order of units, 'little' or 'big'
+        :param offset: Byte offset of first instruction
+        :returns: Generator of tuples (byte offset, number of bytes,
+                  result of parse)
+
+        """
+        if endian not in ('little', 'big'):
+            raise Exception("endian must be 'little' or 'big'")
+        unit = self.unit
+        size = unit // 8
+        shift = unit - self.prefix_bits
+        table = self._dispatch()
+        with memoryview(buf) as mv, mv.cast('B') as b:
+            end = offset + (len(b) - offset) // size * size
+            fmt = _WORD_FORMATS.get(size)
+            if fmt is None:
+                units = (int.from_bytes(b[pos:pos+size], endian)
+                         for pos in range(offset, end, size))
+            else:
+                fmt = ('<' if endian == 'little' else '>') + fmt
+                units = (u for u, in struct.iter_unpack(fmt, b[offset:end]))
+            pos = offset
+            for code in units:
+                n, parse = table[code >> shift]
+                for _ in range(n - 1):
+                    # -1 makes code negative if the stream is cut off
+                    code = code << unit | next(units, -1)
+                if code < 0:
+                    return
+                yield pos, n * size, parse(code)
+                pos += n * size
+
+    def parse_buffer(self, buf, endian: str = 'little', offset: int = 0
+                     ) -> list[tuple[int, int, list], ...]:
+        """Parse all instructions of a buffer
+
+        :param buf:    Object supporting the buffer protocol
+        :param endian: Byte order of units, 'little' or 'big'
+        :param offset: Byte offset of first instruction
+        :returns: List of tuples (byte offset, number of bytes,
+                  result of parse)
+
+        """
+        return list(self.iter_buffer(buf, endian, offset))
+
+
+_CARE_TABLE = str.maketrans('0x', '10')
+
+
+def _ambiguous_pairs(cares: list[int, ...], values: list[int, ...],
+                     tolerance: int = 0,
+                     leaf: int = 16) -> list[tuple[int, int], ...]:
+    """Find all pairs of patterns that can match the same code
+
+    Pattern i is given by the integers cares[i] and values[i]. The set of
+    patterns is partitioned recursively on a fixed bit into those with the
+    bit 0, those with it 1 and those that do not care, like a ternary
+    trie. Pairs with opposite fixed values are never compared, so the
+    cost follows the number of real conflicts rather than n**2. A set is
+    only split when that saves more pair tests than the split costs.
+
+    :param tolerance: Also find pairs that conflict in up to this many
+                      bits, i.e. that would become ambiguous if those
+                      bits were removed
+    :returns: Sorted list of index pairs (i, j) with i < j
+
+    """
+    width = max(cares, default=0).bit_length()
+    bits = [1 << b for b in range(width)]
+    pairs = []
+
+    def brute(A, B):
+        for a in A:
+            ca = cares[a]
+            va = values[a]
+            for b in B:
+                c = (va ^ values[b]) & ca & cares[b]
+                if not c or (tolerance and c.bit_count() <= tolerance):
+                    pairs.append((a, b) if a < b else (b, a))
+
+    if len(cares) <= leaf:
+        for ii in range(len(cares)):
+            brute([ii], range(ii+1, len(cares)))
+        return pairs
+
+    def split(S, bit):
+        S0 = [k for k in S if cares[k] & bit and not values[k] & bit]
+        S1 = [k for k in S if cares[k] & bit and values[k] & bit]
+        Sx = [k for k in S if not cares[k] & bit]
+        return S0, S1, Sx
+
+    # bit b of a pattern is spread out to a lane of its own at bit b*lane
+    # of a long integer, so that summing these integers over a set of
+    # patterns counts the patterns with each bit set
+    lane = len(cares).bit_length() + 1
+    lanemask = 2**lane - 1
+    spread = [sum(1 << (b * lane) for b in range(8) if x >> b & 1)
+              for x in range(256)]
+
+    def spread_bits(x):
+        y = 0
+        n = 0
+        while x:
+            y |= spread[x & 255] << (n * lane)
+            x >>= 8
+            n += 8
+        return y
+
+    scares = [spread_bits(c) for c in cares]
+    sones = [spread_bits(c & v) for c, v in zip(cares, values)]
+
+    def counts(S):
+        nc = sum(scares[k] for k in S)
+        n1 = sum(sones[k] for k in S)
+        n1 = [(n1 >> (b * lane)) & lanemask for b in range(width)]
+        n0 = [((nc >> (b * lane)) & lanemask) - n1[b] for b in range(width)]
+        return n0, n1
+
+    def within(S, tol, used):
+        if len(S) > leaf:
+            n0, n1 = counts(S)
+            best = max((b for b in range(width) if not used & bits[b]),
+                       key=lambda b: n0[b] * n1[b], default=None)
+            if best is not None and n0[best] * n1[best] > len(S) * width:
+                used |= bits[best]
+                S0, S1, Sx = split(S, bits[best])
+                within(S0, tol, used)
+                within(S1, tol, used)
+                within(Sx, tol, used)
+                cross(S0, Sx, tol, used)
+                cross(S1, Sx, tol, used)
+                if tol:
+                    cross(S0, S1, tol - 1, used)
+                return
+        for ii in range(len(S)):
+            brute(S[ii:ii+1], S[ii+1:])
+
+    def cross(A, B, tol, used):
+        if not A or not B:
+            return
+        if len(A) * len(B) > leaf * leaf:
+            a0, a1 = counts(A)
+            b0, b1 = counts(B)
+            best = max((b for b in range(width) if not used & bits[b]),
+                       key=lambda b: a0[b] * b1[b] + a1[b] * b0[b],
+                       default=None)
+            if best is not None and a0[best] * b1[best] + \
+                    a1[best] * b0[best] > (len(A) + len(B)) * width:
+                used |= bits[best]
+                A0, A1, Ax = split(A, bits[best])
+                B0, B1, Bx = split(B, bits[best])
+                for X, Y in ((A0, B0), (A0, Bx), (A1, B1), (A1, Bx),
+                             (Ax, B0), (Ax, B1), (Ax, Bx)):
+                    cross(X, Y, tol, used)
+                if tol:
+                    cross(A0, B1, tol - 1, used)
+                    cross(A1, B0, tol - 1, used)
+                return
+        brute(A, B)
+
+    within(list(range(len(cares))), tolerance, 0)
+    pairs.sort()
+    return pairs
+
+
+def _care_value(p: str) -> tuple[int, int]:
+    """Return integer care mask and value of bitpattern string
+
+    Bits given as '0' or '1' are set in the care mask, and bits given as
+    '1' are set in the value.
+
+    """
+    care = int(re.sub('[^01]', 'x', p).translate(_CARE_TABLE) or '0', 2)
+    value = int(re.sub('[^1]', '0', p) or '0', 2)
+    return care, value
+
+
+def _rm_seps(seps: list[str, ...], bl: list[int, ...]) -> list[str, ...]:
+    """Return separators of a pattern with the bits in bl removed
+
+    The separators of a removed bit are joined with those of the next
+    remaining bit.
+
+    """
+    nbits = len(seps) - 1
+    newseps = []
+    rem = ''
+    for ii in range(nbits):
+        if ii in bl:
+            rem += seps[ii]
+        else:
+            newseps.append(seps[ii] + rem)
+            rem = ''
+    newseps.append(seps[nbits]+rem)
+    return newseps
+
+
+def _deposit_tables(iis: list[int, ...]) -> list[list[int, ...], ...]:
+    """Return byte-wise tables for depositing a value at bit positions
+
+    Bit b of the value goes to bit iis[b]. Table k maps byte k of the
+    value to its bits in place.
+
+    """
+    nb = len(iis)
+    return [[sum(1 << iis[k + b] for b in range(8) if x >> b & 1)
+             for x in range(1 << min(8, nb - k))]
+            for k in range(0, nb, 8)]
+
+
+def _deposit(tables: list[list[int, ...], ...], v: int) -> int:
+    """Deposit value v by tables from _deposit_tables
+
+    """
+    r = 0
+    for t in tables:
+        r |= t[v & 255]
+        v >>= 8
+    return r
+
+
+def _squeeze_runs(bl: list[int, ...], nbits: int
+                  ) -> list[tuple[int, int, int], ...]:
+    """Return runs of kept bits when the bits in bl are removed
+
+    Each run is a tuple (shift, mask, newpos): the bits (x >> shift) & mask
+    move to bit newpos.
+
+    """
+    runs = []
+    pos = 0
+    ii = 0
+    while ii < nbits:
+        if ii in bl:
+            ii += 1
+            continue
+        jj = ii
+        while jj < nbits and jj not in bl:
+            jj += 1
+        runs.append((ii, (1 << (jj - ii)) - 1, pos))
+        pos += jj - ii
+        ii = jj
+    return runs
+
+
+def _cube_trie(cubes: list[tuple[int, int], ...], ids: list[int, ...] = None,
+               used: int = 0, leaf: int = 8):
+    """Build ternary trie over cubes for intersection queries
+
+    A cube is a tuple (care, value) of integers. Nodes are tuples
+    (bit, zero, one, dontcare) splitting the cubes on a bit they fix,
+    leaves are lists of cube indices.
+
+    """
+    if ids is None:
+        ids = list(range(len(cubes)))
+    if len(ids) <= leaf:
+        return ids
+    free = 0
+    for ii in ids:
+        free |= cubes[ii][0]
+    free &= ~used
+    best = None
+    bestscore = 0
+    while free:
+        bit = free & -free
+        free ^= bit
+        n1 = sum(1 for ii in ids if cubes[ii][1] & bit)
+        n0 = sum(1 for ii in ids if cubes[ii][0] & bit) - n1
+        if n0 * n1 > bestscore:
+            best = bit
+            bestscore = n0 * n1
+    if best is None:
+        return ids
+    used |= best
+    t0 = [ii for ii in ids if cubes[ii][0] & best and not cubes[ii][1] & best]
+    t1 = [ii for ii in ids if cubes[ii][1] & best]
+    tx = [ii for ii in ids if not cubes[ii][0] & best]
+    return (best, _cube_trie(cubes, t0, used, leaf),
+            _cube_trie(cubes, t1, used, leaf),
+            _cube_trie(cubes, tx, used, leaf))
+
+
+def _cube_query(node, cubes: list[tuple[int, int], ...], care: int,
+                value: int) -> list[int, ...]:
+    """Return indices of cubes in trie intersecting cube (care, value)
+
+    """
+    found = []
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            found += [ii for ii in node
+                      if not (cubes[ii][1] ^ value) & cubes[ii][0] & care]
+            continue
+        bit, t0, t1, tx = node
+        stack.append(tx)
+        if not care & bit:
+            stack += [t0, t1]
+        elif value & bit:
+            stack.append(t1)
+        else:
+            stack.append(t0)
+    return found
+
+
+def _cube_covered(care: int, value: int,
+                  cubes: list[tuple[int, int], ...]) -> bool:
+    """Check if cube (care, value) is covered by the union of cubes
+
+    The cube is split on bits fixed by other cubes until it is contained
+    in a single cube or no cube intersects a part of it.
+
+    """
+    cubes = [(c, v) for c, v in cubes if not (v ^ value) & c & care]
+    if not cubes:
+        return False
+    free = 0
+    for c, v in cubes:
+        if not c & ~care:
+            return True
+        free |= c
+    free &= ~care
+    # split on the bit most cubes fix
+    bit = max((1 << b for b in range(free.bit_length()) if free >> b & 1),
+              key=lambda b: sum(1 for c, v in cubes if c & b))
+    return (_cube_covered(care | bit, value, cubes) and
+            _cube_covered(care | bit, value | bit, cubes))
+
+
+def _qm_primes(cubes: set[tuple[int, int], ...]) -> set[tuple[int, int], ...]:
+    """Quine-McCluskey merging of cubes
+
+    Cubes with the same care mask and values differing in a single bit,
+    i.e. in neighbouring popcount groups, are merged into a cube not
+    caring about that bit, until no more merges are possible. The
+    neighbour of a value is found by hash lookup instead of comparing all
+    members of the popcount groups.
+
+    :returns: Set of cubes that could not be merged further
+
+    """
+    primes = set()
+    level = set(cubes)
+    while level:
+        groups = collections.defaultdict(set)
+        for c, v in level:
+            groups[c].add(v)
+        merged = set()
+        nxt = set()
+        for c, vals in groups.items():
+            for v in vals:
+                bits = c & ~v
+                while bits:
+                    bit = bits & -bits
+                    bits ^= bit
+                    if v | bit in vals:
+                        nxt.add((c & ~bit, v))
+                        merged.add((c, v))
+                        merged.add((c, v | bit))
+        primes |= level - merged
+        level = nxt
+    return primes
+
+
+def _irredundant(cubes: list[tuple[int, int], ...]
+                 ) -> list[tuple[int, int], ...]:
+    """Remove cubes covered by the union of the others
+
+    Small cubes are tried first, so the big ones tend to be kept.
+
+    """
+    cubes = sorted(set(cubes), key=lambda cv: (-cv[0].bit_count(), cv))
+    trie = _cube_trie(cubes)
+    alive = [True] * len(cubes)
+    for ii, (c, v) in enumerate(cubes):
+        others = [cubes[jj] for jj in _cube_query(trie, cubes, c, v)
+                  if jj != ii and alive[jj]]
+        if _cube_covered(c, v, others):
+            alive[ii] = False
+    return [cv for cv, a in zip(cubes, alive) if a]
+
+
+def _expand(cover: list[tuple[int, int], ...], on: list[tuple[int, int], ...],
+            ontrie) -> list[tuple[int, int], ...]:
+    """Expand cubes as long as they stay within the union of on
+
+    Small cubes are expanded first, and cubes contained in an already
+    expanded cube are dropped.
+
+    """
+    expanded = []
+    for c, v in sorted(cover, key=lambda cv: (-cv[0].bit_count(), cv)):
+        if any(not (c2 & ~c) and not (v2 ^ v) & c2 for c2, v2 in expanded):
+            continue
+        bits = c
+        while bits:
+            bit = bits & -bits
+            bits ^= bit
+            mirror = v ^ bit
+            inside = [on[ii] for ii in _cube_query(ontrie, on, c, mirror)]
+            if _cube_covered(c, mirror, inside):
+                c &= ~bit
+                v &= ~bit
+        expanded.append((c, v))
+    return expanded
+
+
+def _espresso(cubes: list[tuple[int, int], ...]
+              ) -> list[tuple[int, int], ...]:
+    """Heuristic minimization in the style of Espresso
+
+    The cubes are expanded and cubes covered by the others are removed.
+    This is repeated while the number of cubes decreases.
+
+    """
+    on = list(set(cubes))
+    ontrie = _cube_trie(on)
+    cover = _irredundant(on)
+    while True:
+        new = _irredundant(_expand(cover, on, ontrie))
+        if len(new) >= len(cover):
+            return cover if len(new) > len(cover) else new
+        cover = new
+
+
+def _quine_mccluskey(cubes: list[tuple[int, int], ...]
+                     ) -> list[tuple[int, int], ...]:
+    """Minimization by Quine-McCluskey merging
+
+    Since the cubes need not be single codes, the merged cubes are
+    expanded to prime implicants before an irredundant cover is selected.
+
+    """
+    on = list(set(cubes))
+    return _irredundant(_expand(_qm_primes(on), on, _cube_trie(on)))
+
+
 class AnalyzerOpcode():
     """Opcode pattern for Analyzer
 
+    Besides the pattern string the opcode keeps the integers care_mask,
+    with the bits given as '0' or '1', and value, with the bits given as
+    '1'.
+
     :param opcode_pattern:  String of bitpatterns with separator characters
     :param description:     Description of opcode, e.g. name or mnemonic
 
@@ -304,9 +2785,30 @@ class AnalyzerOpcode():
         """
         p, self.seps = unzip_sep(opcode_pattern)
         # store lsb first
-        self._pattern = p[::-1]
+        self._set_pattern(p[::-1])
         self.desc = description.strip()
 
+    def _set_pattern(self, p: str):
+        """Set bitpattern, given lsb first, and its integer representation
+
+        """
+        self._pattern = p
+        self.care_mask, self.value = _care_value(p[::-1])
+
+    @classmethod
+    def _make(cls, p: str, care_mask: int, value: int, description: str,
+              seps: list[str, ...]) -> 'AnalyzerOpcode':
+        """Make opcode from bitpattern, given lsb first, and its integers
+
+        """
+        oc = cls.__new__(cls)
+        oc._pattern = p
+        oc.care_mask = care_mask
+        oc.value = value
+        oc.desc = description
+        oc.seps = seps
+        return oc
+
     def __len__(self):
         return len(self._pattern)
 
@@ -363,17 +2865,8 @@ class AnalyzerOpcode():
         """
         nbits = len(self._pattern)
         sn = ''.join(self._pattern[ii] for ii in range(nbits) if ii not in bl)
-        newseps = []
-        rem = ''
-        for ii in range(nbits):
-            if ii in bl:
-                rem += self.seps[ii]
-            else:
-                newseps.append(self.seps[ii] + rem)
-                rem = ''
-        newseps.append(self.seps[nbits]+rem)
         oc = AnalyzerOpcode(sn[::-1], self.desc)
-        oc.seps = newseps
+        oc.seps = _rm_seps(self.seps, bl)
         return oc
 
     def combine(self, oc: 'AnalyzerOpcode') -> None | 'AnalyzerOpcode':
@@ -405,23 +2898,11 @@ class AnalyzerOpcode():
     def intersect(self, oc: 'AnalyzerOpcode') -> bool:
         """Check if opcodes can describe same bitpattern
 
+        Patterns of different length are compared from the least
+        significant bit up to the length of the shorter one.
+
         """
-        p1 = self._pattern
-        p2 = oc.pattern()[::-1]
-        l1 = len(p1)
-        l2 = len(p2)
-        d = l1 - l2
-        if d > 0:
-            p1 = p1[:l2]
-        elif d < 0:
-            p2 = p2[:l1]
-        x = False
-        for ii in range(len(p1)):
-            c1 = p1[ii]
-            c2 = p2[ii]
-            m = (c1 in {'0', '1'}) and (c2 in {'0', '1'})
-            x = x or (m and c1 != c2)
-        return not x
+        return 0 == (self.value ^ oc.value) & self.care_mask & oc.care_mask
 
     def replace_field(self, field: str, val: str):
         """Replace a field by a string
@@ -430,7 +2911,7 @@ class AnalyzerOpcode():
         :param val:   string to replace field
 
         """
-        self._pattern = self._pattern.replace(field, val)
+        self._set_pattern(self._pattern.replace(field, val))
 
     def expand_field(self, field: str, excpt: list[str, ...] = [],
                      tag=None) -> list['AnalyzerOpcode', ...]:
@@ -447,45 +2928,343 @@ class AnalyzerOpcode():
          field holding the name of the bitfield and the string p holding
          the actual pattern of the field.
 
+        """
+        return list(self.iter_expand(field, excpt, tag))
+
+    def iter_expand(self, field: str, excpt: list[str, ...] = [],
+                    tag=None):
+        """Generate opcodes with given field expanded
+
+        Same as expand_field, but the opcodes are made one at a time. The
+        field value is deposited into the pattern integers by table lookup
+        and the pattern string is made from a template.
+
+        """
+        if field in ['1', '0', '|', '_', '*', ' ']:
+            yield self
+            return
+        iis = [ii for ii, ch in enumerate(self._pattern) if ch == field]
+        if not iis:
+            yield self
+            return
+        nb = len(iis)
+        excpt = set(excpt)
+        fmt = '{{:0{}b}}'.format(nb)
+        template = ''.join('{}' if ch == field else
+                           ch.replace('{', '{{').replace('}', '}}')
+                           for ch in self._pattern)
+        tables = _deposit_tables(iis)
+        care = self.care_mask | sum(1 << ii for ii in iis)
+        for v in range(2**nb):
+            p = fmt.format(v)
+            if p in excpt:
+                continue
+            value = self.value | _deposit(tables, v)
+            yield AnalyzerOpcode._make(template.format(*p[::-1]), care, value,
+                                       tag(self.desc, field, p), self.seps)
+
+    def expand_count(self, field: str, excpt: list[str, ...] = []) -> int:
+        """Number of opcodes expand_field would make
+
         """
         if field in ['1', '0', '|', '_', '*', ' ']:
-            return [self]
-        iis = [ii for ii in range(len(self._pattern))
-               if field == self._pattern[ii]]
-        iis.reverse()
-        if iis:
-            nb = len(iis)
+            return 1
+        nb = sum(1 for ch in self._pattern if ch == field)
+        if not nb:
+            return 1
+        return 2**nb - len({p for p in excpt if isinstance(p, str)
+                            and len(p) == nb and not p.strip('01')})
+
+
+class _ExpandedCodes():
+    """Opcode-pattern set with a field expanded on demand
+
+    Sequence of the opcodes of base, with the field of the opcodes in cno
+    expanded. The expanded opcodes are made while iterating, so base may
+    itself be an _ExpandedCodes and chained expansions stream without
+    keeping all patterns in memory.
+
+    """
+    def __init__(self, base, field: str, cno: None | list[int, ...],
+                 excpt: list[str, ...], tag):
+        self.base = base
+        self.field = field
+        self.cno = None if cno is None else set(cno)
+        self.excpt = excpt
+        self.tag = tag
+
+    def __iter__(self):
+        for ii, c in enumerate(self.base):
+            if self.cno is None or ii in self.cno:
+                yield from c.iter_expand(self.field, self.excpt, self.tag)
+            else:
+                yield c
+
+    def __len__(self):
+        return sum(c.expand_count(self.field, self.excpt)
+                   if self.cno is None or ii in self.cno else 1
+                   for ii, c in enumerate(self.base))
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return list(self)[key]
+        if key < 0:
+            key += len(self)
+        for c in itertools.islice(self, key, None):
+            return c
+        raise IndexError("index out of range")
+
+
+class _CodeColumns():
+    """Opcode-pattern set stored in columns
+
+    The length, care mask and value of every pattern are kept in parallel
+    arrays. Descriptions, separator layouts and field layouts, the masks
+    of the bits of each field character, are kept once in tables and
+    referred to by index, so patterns made by expanding a field share
+    them. AnalyzerOpcode objects are made when the set is iterated or
+    indexed. Patterns are limited to 64 bits.
+
+    """
+    def __init__(self):
+        self.lens = array.array('H')
+        self.care = array.array('Q')
+        self.value = array.array('Q')
+        self.desc = array.array('I')
+        self.sep = array.array('I')
+        self.field = array.array('I')
+        self.descs = []
+        self.layouts = []
+        self.fieldsets = []
+        self._index = {'desc': {}, 'sep': {}, 'field': {}}
+
+    @classmethod
+    def from_codes(cls, codes) -> '_CodeColumns':
+        """Make columns from opcodes
+
+        """
+        cols = cls()
+        for c in codes:
+            masks = {}
+            for b, ch in enumerate(c._pattern):
+                if ch not in '01':
+                    masks[ch] = masks.get(ch, 0) | 1 << b
+            cols._append(len(c), c.care_mask, c.value,
+                         cols._intern('desc', c.desc),
+                         cols._intern('sep', tuple(c.seps)),
+                         cols._intern('field',
+                                      tuple(sorted(masks.items()))))
+        return cols
+
+    def _derive(self) -> '_CodeColumns':
+        """Make empty columns sharing the tables
+
+        The tables are only appended to, so indices stay valid in every
+        set sharing them.
+
+        """
+        cols = _CodeColumns()
+        cols.descs = self.descs
+        cols.layouts = self.layouts
+        cols.fieldsets = self.fieldsets
+        cols._index = self._index
+        return cols
+
+    def _intern(self, kind: str, item) -> int:
+        """Return index of item in table of given kind, appending it if new
+
+        """
+        table = {'desc': self.descs, 'sep': self.layouts,
+                 'field': self.fieldsets}[kind]
+        index = self._index[kind]
+        ii = index.get(item)
+        if ii is None:
+            ii = index[item] = len(table)
+            table.append(item)
+        return ii
+
+    def _append(self, n: int, care: int, value: int, descno: int,
+                sepno: int, fieldno: int):
+        """Append a pattern given by its integers and table indices
+
+        """
+        if n > 64:
+            raise Exception("compact patterns are limited to 64 bits")
+        self.lens.append(n)
+        self.care.append(care)
+        self.value.append(value)
+        self.desc.append(descno)
+        self.sep.append(sepno)
+        self.field.append(fieldno)
+
+    def __len__(self):
+        return len(self.care)
+
+    def __iter__(self):
+        for ii in range(len(self.care)):
+            yield self._opcode(ii)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self._opcode(ii) for ii in range(len(self.care))[key]]
+        return self._opcode(range(len(self.care))[key])
+
+    def _opcode(self, ii: int) -> AnalyzerOpcode:
+        """Make the AnalyzerOpcode of a pattern
+
+        """
+        care = self.care[ii]
+        value = self.value[ii]
+        p = ['1' if value >> b & 1 else '0'
+             for b in range(self.lens[ii])]
+        for ch, m in self.fieldsets[self.field[ii]]:
+            while m:
+                bit = m & -m
+                p[bit.bit_length() - 1] = ch
+                m ^= bit
+        return AnalyzerOpcode._make(''.join(p), care, value,
+                                    self.descs[self.desc[ii]],
+                                    list(self.layouts[self.sep[ii]]))
+
+    def rmbits(self, bl: list[int, ...]) -> '_CodeColumns':
+        """Make columns with specified bits removed
+
+        """
+        bl = set(bl)
+        runs = _squeeze_runs(bl, max(self.lens, default=0))
+
+        def squeeze(x):
+            return sum(((x >> s) & m) << p for s, m, p in runs)
+
+        cols = self._derive()
+        cols.lens = array.array('H', (n - sum(b < n for b in bl)
+                                      for n in self.lens))
+        cols.care = array.array('Q', map(squeeze, self.care))
+        cols.value = array.array('Q', map(squeeze, self.value))
+        cols.desc = self.desc[:]
+        sepno = {s: cols._intern('sep',
+                                 tuple(_rm_seps(self.layouts[s], bl)))
+                 for s in set(self.sep)}
+        cols.sep = array.array('I', (sepno[s] for s in self.sep))
+        fieldno = {f: cols._intern('field',
+                                   tuple((ch, squeeze(m)) for ch, m in
+                                         self.fieldsets[f] if squeeze(m)))
+                   for f in set(self.field)}
+        cols.field = array.array('I', (fieldno[f] for f in self.field))
+        return cols
+
+    def replace_field(self, field: str, val: str,
+                      cno: None | list[int, ...]) -> None | '_CodeColumns':
+        """Make columns with a field replaced by a character
+
+        :returns: None if field or val is not a single character, or if
+                  field is '0' or '1'
+
+        """
+        if len(field) != 1 or len(val) != 1 or field in '01':
+            return None
+        cols = self._derive()
+        cols.lens = self.lens[:]
+        cols.care = self.care[:]
+        cols.value = self.value[:]
+        cols.desc = self.desc[:]
+        cols.sep = self.sep[:]
+        cols.field = self.field[:]
+        new = {}
+        for ii in range(len(cols)) if cno is None else cno:
+            f = self.field[ii]
+            if f not in new:
+                masks = dict(self.fieldsets[f])
+                m = masks.pop(field, 0)
+                if m and val not in '01':
+                    masks[val] = masks.get(val, 0) | m
+                new[f] = (m, cols._intern('field',
+                                          tuple(sorted(masks.items()))))
+            m, cols.field[ii] = new[f]
+            if m and val in '01':
+                cols.care[ii] |= m
+                if val == '1':
+                    cols.value[ii] |= m
+        return cols
+
+    def expand_field(self, field: str, cno: None | list[int, ...],
+                     excpt: list[str, ...], tag) -> '_CodeColumns':
+        """Make columns with a field expanded
+
+        """
+        cno = None if cno is None else set(cno)
+        excpt = set(excpt)
+        cols = self._derive()
+        new = {}
+        for ii in range(len(self)):
+            f = self.field[ii]
+            if f not in new:
+                masks = dict(self.fieldsets[f])
+                m = masks.pop(field, 0)
+                iis = [b for b in range(m.bit_length()) if m >> b & 1]
+                new[f] = (m, len(iis), _deposit_tables(iis),
+                          cols._intern('field',
+                                       tuple(sorted(masks.items()))))
+            m, nb, tables, fieldno = new[f]
+            row = (self.lens[ii], self.care[ii], self.value[ii])
+            if not m or (cno is not None and ii not in cno):
+                cols._append(*row, self.desc[ii], self.sep[ii], f)
+                continue
             fmt = '{{:0{}b}}'.format(nb)
-            patt = [fmt.format(ii) for ii in range(2**nb)]
-            patt = [p for p in patt if p not in excpt]
-            new = []
-            for p in patt:
-                s = self._pattern
-                ls = len(s)
-                for jj in range(len(iis)):
-                    ii = iis[jj]
-                    s = s[0:ii] + p[jj] + s[ii+1:ls]
-                desc = tag(self.desc, field, p)
-                oc = AnalyzerOpcode(s[::-1], desc)
-                oc.seps = self.seps
-                new.append(oc)
-            return new
-        else:
-            return [self]
+            desc = self.descs[self.desc[ii]]
+            for v in range(2**nb):
+                p = fmt.format(v)
+                if p in excpt:
+                    continue
+                cols._append(row[0], row[1] | m, row[2] | _deposit(tables, v),
+                             cols._intern('desc', tag(desc, field, p)),
+                             self.sep[ii], fieldno)
+        return cols
 
 
 class Analyzer():
     """Class for analyzing instruction set
 
+    The history of opcode-pattern sets shares the AnalyzerOpcode objects
+    that an operation leaves unchanged, so each step only costs a list of
+    references and the changed patterns. Opcode objects are therefore
+    never modified in place once they are in the history.
+
+    With compact() the current set is stored in columns of integers
+    instead. rmbits, replace_field, expand_field, ambiguities and the bit
+    worths then work on the columns, and opcode objects are only made by
+    get_codes() or when the set is listed.
+
     :param opcode_patterns: Instruction set as list of AnalyzerOpcode objects
+    :param max_history:     Maximum number of opcode-pattern sets kept in
+                            history. The oldest are evicted. None for no
+                            limit.
 
     """
-    def __init__(self, opcode_patterns: list[AnalyzerOpcode, ...]):
+    def __init__(self, opcode_patterns: list[AnalyzerOpcode, ...],
+                 max_history: None | int = None):
         """Constructor method
 
         """
         self.codes = [[AnalyzerOpcode(*p) for p in opcode_patterns]]
         self.cp = 0
+        self.max_history = max_history
+
+    def _push(self, codes: list[AnalyzerOpcode, ...]):
+        """Make codes the new current opcode-pattern set
+
+        Newer sets are deleted, and the oldest sets are evicted if the
+        history is longer than max_history.
+
+        """
+        self.cp += 1
+        del self.codes[self.cp:]
+        self.codes.append(codes)
+        if self.max_history is not None and \
+                len(self.codes) > max(self.max_history, 1):
+            evict = len(self.codes) - max(self.max_history, 1)
+            del self.codes[:evict]
+            self.cp -= evict
 
     def __repr__(self):
         s = 'Analyzer(['
@@ -525,9 +3304,9 @@ class Analyzer():
         :param codenos: list of opcode pattern numbers
 
         """
-        an = Analyzer([])
+        an = Analyzer([], self.max_history)
         if codenos:
-            codes = [self.codes[self.cp][ii] for ii in codenos]
+            codes = [self.get_codes()[ii] for ii in codenos]
         else:
             codes = self.codes[self.cp]
         an.codes = [[c.copy() for c in codes]]
@@ -545,8 +3324,7 @@ class Analyzer():
         w = math.ceil(math.log(nc)/math.log(10.0))
         cl = max([c.lstrlen() for c in codes])
         fmt = "{{:>{}}}  {{:>{}}}  {{}}".format(w, cl)
-        for n in range(nc):
-            code = codes[n]
+        for n, code in enumerate(codes):
             if len(code):
                 s = fmt.format(n, code.lstr(), code.desc)
             else:
@@ -564,10 +3342,11 @@ class Analyzer():
         :param  sep:  separator character
 
         """
-        codes = self.codes[self.cp]
+        codes = self.get_codes()
         if ins is None:
             ins = list(range(len(codes)))
         for ii in ins:
+            codes[ii] = codes[ii].copy()
             codes[ii].setsep(seps, sep)
 
     def delsep(self, seps: list[int, ...], ins: None | list[int, ...] = None):
@@ -579,10 +3358,11 @@ class Analyzer():
         :param  ins:  index to opcodes which are affected
 
         """
-        codes = self.codes[self.cp]
+        codes = self.get_codes()
         if ins is None:
             ins = list(range(len(codes)))
         for ii in ins:
+            codes[ii] = codes[ii].copy()
             codes[ii].delsep(seps)
 
     def rmbits(self, bl: list[int, ...]):
@@ -592,9 +3372,11 @@ class Analyzer():
 
         """
         codes = self.codes[self.cp]
-        self.cp += 1
-        self.codes = self.codes[:self.cp]
-        self.codes.append([c.rmbits(bl) for c in codes])
+        if isinstance(codes, _CodeColumns):
+            self._push(codes.rmbits(bl))
+            return
+        self._push([c.rmbits(bl) if any(b < len(c) for b in bl) else c
+                    for c in codes])
 
     def lsambig(self):
         """List ambiguities between opcode patterns
@@ -609,46 +3391,130 @@ class Analyzer():
             print("{}: {}, {}: {}".format(a[0][0], a[0][1], a[1][0], a[1][1]))
         print('Number of ambiguities: {}\n'.format(len(amb)))
 
-    def ambiguities(self):
+    def ambiguities(self, method: str = 'partition'):
         """Checks opcode patterns for possible ambiguities
 
         Checks all pairs of opcode patterns to see if there
         exists a bit pattern that matches both opcode patterns.
 
+        :param method: 'partition' to only compare patterns that are not
+                       told apart by a fixed bit, 'pairwise' to compare
+                       all pairs. Both give the same result.
         :returns:  list of tuples of mutually ambiguous opcode patterns
                    each specified as a tuple of opcode index and description
 
         """
-        codes = [c for c in self.codes[self.cp] if len(c)]
-        nc = len(codes)
-        count = 0
+        descs, cares, values, lens = self._patterns()
+        nc = len(cares)
+        if method == 'partition':
+            return [((ii, descs[ii]), (jj, descs[jj]))
+                    for ii, jj in _ambiguous_pairs(cares, values)]
+        if method != 'pairwise':
+            raise Exception("unknown method \"{}\"".format(method))
         amb = []
         for ii in range(nc):
-            c1 = codes[ii]
+            c1 = cares[ii]
+            v1 = values[ii]
             for jj in range(ii+1, nc):
-                if c1.intersect(codes[jj]):
-                    amb.append(((ii, c1.desc), (jj, codes[jj].desc)))
+                if not (v1 ^ values[jj]) & c1 & cares[jj]:
+                    amb.append(((ii, descs[ii]), (jj, descs[jj])))
         return amb
 
     def bitworth(self) -> list[int, ...]:
         """Calculate each bit's worth
 
         The worth is calculated as the increase in the number of ambiguities
-        in the instruction set if the bit is removed.
+        in the instruction set if the bit is removed. Removing a bit makes
+        the pairs of patterns ambiguous that conflict in that bit only, so
+        all worths are found from one search for such pairs.
 
         :returns:  List of each bit's worth
 
         """
-        nbits = max(len(c) for c in self.codes[self.cp])
-        worth = []
-        an = self.copy_current()
-        a0 = len(an.ambiguities())
-        for n in range(nbits):
-            an.rmbits([n])
-            worth.append(len(an.ambiguities())-a0)
-            an.undo()
+        nbits = max(self._patterns()[3], default=0)
+        worth = self._setworth(1, nbits)
+        return [worth.get((n,), 0) for n in range(nbits)]
+
+    def bitsetworth(self, k: int) -> list[tuple[tuple[int, ...], int], ...]:
+        """Calculate the worth of sets of k bits
+
+        The worth of a set of bits is the increase in the number of
+        ambiguities in the instruction set if all bits of the set are
+        removed. Sets of high worth are good slices to decode by.
+
+        :param k: Number of bits in each set
+        :returns: List of tuples (bits, worth) for the sets with nonzero
+                  worth, highest worth first
+
+        """
+        nbits = max(self._patterns()[3], default=0)
+        worth = self._setworth(k, nbits)
+        return sorted(((b, w) for b, w in worth.items() if w),
+                      key=lambda x: (-x[1], x[0]))
+
+    def _setworth(self, k: int, nbits: int) -> dict:
+        """Return worth of sets of k bits as dictionary
+
+        A pair of patterns becomes ambiguous when the bits it conflicts in
+        are removed, so each pair with up to k conflicting bits adds to
+        the sets of k bits that contain its conflict. Patterns of k bits or
+        less can disappear altogether, and with them their ambiguities,
+        so pairs involving them are checked set by set.
+
+        """
+        descs, cares, values, lens = self._patterns()
+        lows = [2**n - 1 for n in lens]
+        short = [n <= k for n in lens]
+        conflicts = collections.Counter()
+        shortpairs = []
+        for ii, jj in _ambiguous_pairs(cares, values, k):
+            c = (values[ii] ^ values[jj]) & cares[ii] & cares[jj]
+            if short[ii] or short[jj]:
+                shortpairs.append((c, ii, jj))
+            elif c:
+                conflicts[c] += 1
+
+        def supersets(mask):
+            have = [b for b in range(nbits) if mask >> b & 1]
+            rest = [b for b in range(nbits) if not mask >> b & 1]
+            if len(have) <= k:
+                for extra in itertools.combinations(rest, k - len(have)):
+                    yield tuple(sorted(have + list(extra)))
+
+        worth = collections.Counter()
+        for c, n in conflicts.items():
+            for bs in supersets(c):
+                worth[bs] += n
+        sets = set()
+        for c, ii, jj in shortpairs:
+            sets.update(supersets(c))
+        for bs in sets:
+            removed = sum(1 << b for b in bs)
+            for c, ii, jj in shortpairs:
+                gone = not lows[ii] & ~removed or not lows[jj] & ~removed
+                if not c and gone:
+                    worth[bs] -= 1
+                elif c and not c & ~removed and not gone:
+                    worth[bs] += 1
         return worth
 
+    def _patterns(self) -> tuple[list, list, list, list]:
+        """Return descriptions, care masks, values and lengths of patterns
+
+        Titles are left out.
+
+        """
+        codes = self.codes[self.cp]
+        if isinstance(codes, _CodeColumns):
+            rows = [ii for ii, n in enumerate(codes.lens) if n]
+            return ([codes.descs[codes.desc[ii]] for ii in rows],
+                    [codes.care[ii] for ii in rows],
+                    [codes.value[ii] for ii in rows],
+                    [codes.lens[ii] for ii in rows])
+        codes = [c for c in codes if len(c)]
+        return ([c.desc for c in codes], [c.care_mask for c in codes],
+                [c.value for c in codes], [len(c) for c in codes])
+
     def undo(self):
         """Sets the previous opcode-pattern set to current set
 
@@ -693,19 +3559,25 @@ class Analyzer():
         :param val:   string to replace field
 
         """
-        codes = [c.copy() for c in self.codes[self.cp]]
+        codes = self.codes[self.cp]
+        if isinstance(codes, _CodeColumns):
+            cols = codes.replace_field(field, val, cno)
+            if cols is not None:
+                self._push(cols)
+                return
+        codes = codes[:]
         nc = len(codes)
         if cno is None:
             cno = list(range(nc))
         for ii in cno:
-            codes[ii].replace_field(field, val)
-        self.cp += 1
-        self.codes = self.codes[:self.cp]
-        self.codes.append(codes)
+            if field in codes[ii]._pattern:
+                codes[ii] = codes[ii].copy()
+                codes[ii].replace_field(field, val)
+        self._push(codes)
 
     def expand_field(self, field: str, cno: None | list[int, ...] = None,
                      excpt: list[int, ...] = [],
-                     tag=lambda d, f, v: d + '_' + f + v):
+                     tag=lambda d, f, v: d + '_' + f + v, lazy: bool = False):
         """Expand an opcode field
 
         Replaces opocode pattern by opcode patterns where a named field
@@ -724,23 +3596,22 @@ class Analyzer():
                       The second, field, is a single character string holding
                       the name of the bitfield. The third string parameter p
                       holds the actual pattern of the field.
+        :param lazy:  If True, the new opcode-pattern set is a view that
+                      makes the expanded opcodes when it is iterated.
+                      Expanding a lazy set again keeps streaming. The set
+                      is made into a list when it is changed in place or
+                      by get_codes(). A compact set is expanded into a
+                      compact set unless lazy is True.
 
         """
         if field in ['1', '0', '|', '_', '*', ' ']:
             return
         codes = self.codes[self.cp]
-        nc = len(codes)
-        if cno is None:
-            cno = list(range(nc))
-        expanded = []
-        for ii in range(nc):
-            if ii in cno:
-                expanded += codes[ii].expand_field(field, excpt, tag)
-            else:
-                expanded.append(codes[ii])
-        self.cp += 1
-        self.codes = self.codes[:self.cp]
-        self.codes.append(expanded)
+        if isinstance(codes, _CodeColumns) and not lazy:
+            self._push(codes.expand_field(field, cno, excpt, tag))
+            return
+        expanded = _ExpandedCodes(self.codes[self.cp], field, cno, excpt, tag)
+        self._push(expanded if lazy else list(expanded))
 
     def delcodes(self, cl: list[int, ...]):
         """Delete opocde patterns
@@ -750,38 +3621,134 @@ class Analyzer():
 
         """
         cl.sort(reverse=True)
-        nc = self.codes[self.cp]
+        nc = self.codes[self.cp][:]
         for ii in cl:
             nc.pop(ii)
-        self.cp += 1
-        self.codes = self.codes[:self.cp]
-        self.codes.append(nc)
+        self._push(nc)
 
     def combinecodes(self):
         """Combine as many code patterns as possible
 
+        Two patterns of the same length are combined if they differ in one
+        bit only, where field characters count as '*'. The combined
+        pattern takes the place of the first one and joins both
+        descriptions. This is repeated until no patterns differ in one bit.
+        Use minimize() to find a minimal set of patterns instead.
+
         """
-        self.dup()
-        codes = self.get_codes()
-        combined = 1
+        codes = self.get_codes()[:]
+        combined = True
         while combined:
-            combined = 0
-            nc = len(codes)
-            pp = [(ii, jj) for ii in range(nc) for jj in range(ii+1, nc)]
+            combined = False
+            # patterns equal except in bit b share the key (len, b, bit-less
+            # care mask, bit-less value) for that bit
+            keys = {}
+            for jj, c in enumerate(codes):
+                for b in range(len(c)):
+                    m = ~(1 << b)
+                    key = (len(c), b, c.care_mask & m, c.value & m)
+                    keys.setdefault(key, []).append(jj)
+            # pairs (ii, jj) are tried from the last backwards, and
+            # patterns are combined at most once per pass
+            used = set()
             deletes = []
-            while len(pp):
-                p = pp.pop()
-                c1 = codes[p[0]]
-                c2 = codes[p[1]]
-                c = c1.combine(c2)
-                if c is not None:
-                    pp = [p0 for p0 in pp if not (p0[0] in p or p0[1] in p)]
-                    codes[p[0]] = c
-                    deletes.append(p[1])
-                    combined += 1
-            deletes.sort(reverse=True)
-            for ii in deletes:
-                del codes[ii]
+            for ii in range(len(codes) - 1, -1, -1):
+                c1 = codes[ii]
+                best = None
+                for b in range(len(c1)):
+                    m = ~(1 << b)
+                    key = (len(c1), b, c1.care_mask & m, c1.value & m)
+                    for jj in reversed(keys[key]):
+                        if jj <= ii or (best is not None and jj <= best):
+                            break
+                        c2 = codes[jj]
+                        if jj not in used and (c1.care_mask != c2.care_mask
+                                               or c1.value != c2.value):
+                            best = jj
+                            break
+                if best is not None:
+                    codes[ii] = c1.combine(codes[best])
+                    used.update((ii, best))
+                    deletes.append(best)
+                    combined = True
+            for jj in sorted(deletes, reverse=True):
+                del codes[jj]
+        self._push(codes)
+
+    def minimize(self, method: str = 'auto', desc: str = 'concat',
+                 limit: int = 512):
+        """Replace code patterns by a minimal set covering the same codes
+
+        Patterns of the same length are minimized as a two-level logic
+        function where field characters are don't cares. Method 'qm'
+        finds prime implicants by Quine-McCluskey merging and selects an
+        irredundant cover from them. Method 'espresso' repeatedly expands
+        the patterns and drops redundant ones instead, which scales
+        better to large sets. The resulting cover is irredundant, but not
+        guaranteed to be minimum.
+        Patterns that are not changed keep their field characters and
+        descriptions. A new pattern takes the place of the first pattern
+        it replaces, so titles and patterns stay in order.
+
+        :param method: 'qm', 'espresso' or 'auto' to use 'qm' for up to
+                       limit patterns and 'espresso' above
+        :param desc:   'concat' to combine any patterns and concatenate the
+                       descriptions of the patterns covered by a new
+                       pattern, or 'keep' to only combine patterns with the
+                       same description
+        :param limit:  Number of patterns above which 'auto' selects
+                       'espresso'
+
+        """
+        if method not in ('auto', 'qm', 'espresso'):
+            raise Exception("Unknown minimize method: " + str(method))
+        if desc not in ('concat', 'keep'):
+            raise Exception("Unknown desc option: " + str(desc))
+        codes = self.get_codes()
+        groups = {}
+        for ii, c in enumerate(codes):
+            if not len(c):
+                groups[('title', ii)] = [ii]
+            elif desc == 'concat':
+                groups.setdefault(len(c), []).append(ii)
+            else:
+                groups.setdefault((len(c), c.desc), []).append(ii)
+        made = []
+        for key, cno in groups.items():
+            if not len(codes[cno[0]]):
+                made.append((cno[0], 0, '', codes[cno[0]]))
+                continue
+            cubes = [(codes[ii].care_mask, codes[ii].value) for ii in cno]
+            if method == 'qm' or (method == 'auto' and len(cubes) <= limit):
+                cover = _quine_mccluskey(cubes)
+            else:
+                cover = _espresso(cubes)
+            trie = _cube_trie(cubes)
+            for c, v in cover:
+                hits = sorted(_cube_query(trie, cubes, c, v))
+                # patterns merged into the new one, or if it only covers
+                # parts of patterns, the patterns it intersects
+                inside = [jj for jj in hits if not c & ~cubes[jj][0]] or hits
+                first = codes[cno[inside[0]]]
+                same = [cno[jj] for jj in inside if cubes[jj] == (c, v)]
+                if same:
+                    oc = codes[same[0]]
+                    if desc == 'concat' and len(inside) > 1:
+                        oc = oc.copy()
+                else:
+                    nb = len(first)
+                    p = ''.join('1' if v >> b & 1 else
+                                '0' if c >> b & 1 else '*'
+                                for b in range(nb - 1, -1, -1))
+                    oc = AnalyzerOpcode(p, first.desc)
+                    oc.seps = first.seps.copy()
+                if desc == 'concat' and len(inside) > 1:
+                    oc.desc = ' '.join(codes[cno[jj]].desc for jj in inside)
+                made.append((cno[inside[0]], -c.bit_count(), oc.pattern(),
+                             oc))
+        made.sort(key=lambda x: x[:3])
+        newcodes = [m[3] for m in made]
+        self._push(newcodes)
 
     def newcode(self, pattern: str, description: str, pos: None | int = None):
         """Add a new opcode pattern to the analyzer
@@ -791,13 +3758,11 @@ class Analyzer():
         to the end.
 
         """
-        nc = self.codes[self.cp]
+        nc = self.codes[self.cp][:]
         if pos is None:
             pos = len(nc)
         nc.insert(pos, AnalyzerOpcode(pattern, description))
-        self.cp += 1
-        self.codes = self.codes[:self.cp]
-        self.codes.append(nc)
+        self._push(nc)
 
     def title(self, pos, text):
         """Add a title
@@ -813,11 +3778,91 @@ class Analyzer():
         cno = [jj for jj in range(len(codes)) if not codes[jj].pattern()]
         self.delcodes(cno)
 
+    def compact(self):
+        """Store the current opcode-pattern set in columns
+
+        The set keeps its place in history. Patterns are limited to 64
+        bits.
+
+        """
+        codes = self.codes[self.cp]
+        if not isinstance(codes, _CodeColumns):
+            self.codes[self.cp] = _CodeColumns.from_codes(codes)
+
     def get_codes(self) -> list[AnalyzerOpcode, ...]:
         """Return list of opcodes
 
+        A lazily expanded or compact opcode-pattern set is made into a list.
+
         """
-        return self.codes[self.cp]
+        codes = self.codes[self.cp]
+        if not isinstance(codes, list):
+            codes = self.codes[self.cp] = list(codes)
+        return codes
+
+    def to_parser(self, field_names: None | dict = None,
+                  priorities: None | dict = None,
+                  filters: None | dict = None, method: str = 'tree',
+                  cache_size: int = 0, result_type: str = 'dict') -> Parser:
+        """Make a compiled Parser from the current opcode patterns
+
+        Each pattern becomes an Opcode named by its description, with
+        pattern, mask and fields taken from the integers of the pattern.
+        Titles are skipped, and repeated descriptions get a suffix _1, _2,
+        ... to make the names unique. The dispatch index is compiled with
+        the given method.
+
+        :param field_names: Dictionary of field character to field name,
+                            e.g. {'c': 'cond'}. A value that is itself a
+                            dictionary renames the fields of the opcode
+                            with that description only.
+        :param priorities:  Dictionary of description to priority
+        :param filters:     Dictionary of description to param_filter
+        :param method:      Compile method, 'tree' or 'table'
+        :param cache_size:  Passed to Parser
+        :param result_type: Passed to Parser
+        :returns: The parser
+
+        """
+        field_names = field_names or {}
+        common = {k: v for k, v in field_names.items()
+                  if not isinstance(v, dict)}
+        priorities = priorities or {}
+        filters = filters or {}
+        parser = Parser(cache_size, result_type)
+        for c in self.codes[self.cp]:
+            if not len(c):
+                continue
+            masks = {}
+            for b, ch in enumerate(c._pattern):
+                if ch not in '01*':
+                    masks[ch] = masks.get(ch, 0) | 1 << b
+            names = common
+            if isinstance(field_names.get(c.desc), dict):
+                names = {**common, **field_names[c.desc]}
+            params = {}
+            segments = {}
+            for ch, m in sorted(masks.items(), key=lambda x: x[1] & -x[1]):
+                rshift = (m & -m).bit_length() - 1
+                if (m >> rshift) & ((m >> rshift) + 1):
+                    bits = [b for b in range(m.bit_length() - 1, -1, -1)
+                            if m >> b & 1]
+                    segments[names.get(ch, ch)] = _segments(bits)
+                else:
+                    params[names.get(ch, ch)] = (m, rshift)
+            name = c.desc
+            n = 0
+            while name in parser._names:
+                n += 1
+                name = '{}_{}'.format(c.desc, n)
+            opc = Opcode._make(name, c.pattern(), c.value, c.care_mask,
+                               params, filters.get(c.desc, _no_filter),
+                               segments)
+            parser.add(opc)
+            if c.desc in priorities:
+                parser.opcodes[-1][1] = priorities[c.desc]
+        parser.compile(method)
+        return parser
 
     def merge(self, other: 'Analyzer', pos: int = None):
         """Merge in another analyzer
@@ -829,9 +3874,7 @@ class Analyzer():
         oc = self.codes[self.cp]
         if pos is None:
             pos = len(oc)
-        self.cp += 1
-        self.codes = self.codes[:self.cp]
-        self.codes.append(oc[:pos] + other.get_codes() + oc[pos:])
+        self._push(oc[:pos] + other.get_codes() + oc[pos:])
 
     def dup(self) -> list[AnalyzerOpcode, ...]:
         """Duplicate current codes
@@ -839,9 +3882,7 @@ class Analyzer():
         :returns: The duplicate
         """
         codes = [c.copy() for c in self.codes[self.cp]]
-        self.cp += 1
-        self.codes = self.codes[:self.cp]
-        self.codes.append(codes)
+        self._push(codes)
         return codes
 
     def move(self, src: int, to: int):
@@ -853,9 +3894,10 @@ class Analyzer():
         """
         if src < 0 or src >= len(self):
             return
-        codes = self.dup()
+        codes = self.codes[self.cp][:]
         c = codes.pop(src)
         codes.insert(max(0, to), c)
+        self._push(codes)
 
     def save(self, name, filename):
         """Save analyzer as pyton code
@@ -0,0 +1,96 @@
+"""Shared fixtures of the tests
+
+The ARMv4T tables of the examples are used as a realistic instruction
+set, and small overlapping tables with different priorities check the
+order of several interpretations.
+
+"""
+import contextlib
+import io
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'examples')]
+
+import ocparse  # noqa: E402
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import armv4t_spec  # noqa: E402
+
+
+def cond_filter(d):
+    return d['cond'] != 15
+
+
+def armv4t_analyzer() -> ocparse.Analyzer:
+    """Return the ARMv4T tables of the example specification as one set
+
+    """
+    an = armv4t_spec.m31.copy_current()
+    an.merge(armv4t_spec.m32.copy_current())
+    an.merge(armv4t_spec.m33.copy_current())
+    return an
+
+
+def armv4t_parser(flt=cond_filter, priorities: bool = False,
+                  **kwargs) -> ocparse.Parser:
+    """Return uncompiled parser of the ARMv4T tables
+
+    Patterns noted [1] in the specification get the filter flt. With
+    priorities, every third opcode gets priority 1 and every fifth
+    priority -1, so that overlapping opcodes hide each other.
+
+    """
+    an = armv4t_analyzer()
+    filters = {c.desc: flt for c in an.get_codes() if '[1]' in c.desc}
+    p = an.to_parser(field_names={'c': 'cond'}, filters=filters)
+    parser = ocparse.Parser(**kwargs)
+    for ii, (opc, pri) in enumerate(p.opcodes):
+        parser.add(opc)
+        if priorities and ii % 3 == 0:
+            parser.set_priority(opc.name, 1)
+        elif priorities and ii % 5 == 0:
+            parser.set_priority(opc.name, -1)
+    return parser
+
+
+def overlap_parser(**kwargs) -> ocparse.Parser:
+    """Return parser of small overlapping patterns with priorities
+
+    """
+    p = ocparse.Parser(**kwargs)
+    for name, pattern, pri in (('x', '0***', 0), ('y', '*0**', 0),
+                               ('z', '**0*', 0), ('w', '***0', 1),
+                               ('v', '0a0b', -1), ('u', '1*c*', 0)):
+        p.add(ocparse.Opcode(name, pattern))
+        p.set_priority(name, pri)
+    return p
+
+
+def words(n: int = 4000, seed: int = 1) -> list:
+    """Return random words and words that match the ARMv4T patterns
+
+    """
+    rnd = random.Random(seed)
+    codes = [c for c in armv4t_analyzer().get_codes() if len(c) == 32]
+    ws = [rnd.getrandbits(32) for _ in range(n)]
+    for _ in range(n):
+        c = rnd.choice(codes)
+        w = (rnd.getrandbits(32) & ~c.care_mask) | c.value
+        if rnd.random() < 0.8:
+            w = w & 0x0fffffff | 0xe0000000
+        ws.append(w)
+    return ws
+
+
+WORDS = words()
+
+
+def linear_results(parser: ocparse.Parser, ws: list = WORDS) -> list:
+    return [parser._parse_linear(w) for w in ws]
+
+
+def check(parser: ocparse.Parser, expected: list, ws: list = WORDS):
+    assert [parser.parse(w) for w in ws] == expected
@@ -0,0 +1,58 @@
+import random
+
+import pytest
+
+import ocparse
+from helpers import armv4t_analyzer
+
+
+def intersect(p1, p2):
+    """Reference: patterns given msb first overlap in their low bits
+
+    """
+    p1 = p1[::-1]
+    p2 = p2[::-1]
+    return not any(a in '01' and b in '01' and a != b
+                   for a, b in zip(p1, p2))
+
+
+def reference_ambiguities(an):
+    codes = [c for c in an.get_codes() if len(c)]
+    return [((ii, codes[ii].desc), (jj, codes[jj].desc))
+            for ii in range(len(codes)) for jj in range(ii+1, len(codes))
+            if intersect(codes[ii].pattern(), codes[jj].pattern())]
+
+
+def random_analyzer(n, nbits, seed, lengths=None):
+    rnd = random.Random(seed)
+    patterns = []
+    for ii in range(n):
+        nb = rnd.choice(lengths) if lengths else nbits
+        p = ''.join(rnd.choice('01**ab') for _ in range(nb))
+        patterns.append((p, 'op{}'.format(ii)))
+    return ocparse.Analyzer(patterns)
+
+
+@pytest.mark.parametrize('method', ['partition', 'pairwise'])
+def test_armv4t_ambiguities(method):
+    an = armv4t_analyzer()
+    assert an.ambiguities(method) == reference_ambiguities(an)
+
+
+@pytest.mark.parametrize('method', ['partition', 'pairwise'])
+@pytest.mark.parametrize('seed', range(5))
+def test_random_ambiguities(method, seed):
+    an = random_analyzer(150, 12, seed)
+    assert an.ambiguities(method) == reference_ambiguities(an)
+
+
+@pytest.mark.parametrize('method', ['partition', 'pairwise'])
+def test_mixed_length_ambiguities(method):
+    an = random_analyzer(60, 0, 7, lengths=[4, 8, 12])
+    an.codes[0].insert(10, ocparse.AnalyzerOpcode('', 'title'))
+    assert an.ambiguities(method) == reference_ambiguities(an)
+
+
+def test_unknown_method():
+    with pytest.raises(Exception):
+        armv4t_analyzer().ambiguities('quadratic')
@@ -0,0 +1,49 @@
+import itertools
+
+import pytest
+
+import ocparse
+from helpers import armv4t_analyzer
+from test_ambiguities import random_analyzer
+
+
+def reference_worth(an, bits):
+    """Reference: increase in ambiguities when the bits are removed
+
+    """
+    a0 = len(an.ambiguities('pairwise'))
+    an.rmbits(list(bits))
+    worth = len(an.ambiguities('pairwise')) - a0
+    an.undo()
+    return worth
+
+
+def test_armv4t_bitworth():
+    an = armv4t_analyzer()
+    assert an.bitworth() == [reference_worth(an, [n]) for n in range(32)]
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_random_bitworth(seed):
+    an = random_analyzer(40, 0, seed, lengths=[1, 2, 6, 8])
+    nbits = max(len(c) for c in an.get_codes())
+    assert an.bitworth() == [reference_worth(an, [n])
+                             for n in range(nbits)]
+
+
+@pytest.mark.parametrize('k', [2, 3])
+@pytest.mark.parametrize('seed', range(3))
+def test_random_bitsetworth(k, seed):
+    an = random_analyzer(30, 0, seed, lengths=[1, 2, 3, 7])
+    nbits = max(len(c) for c in an.get_codes())
+    worth = [(bs, reference_worth(an, bs))
+             for bs in itertools.combinations(range(nbits), k)]
+    expected = sorted(((bs, w) for bs, w in worth if w),
+                      key=lambda x: (-x[1], x[0]))
+    assert an.bitsetworth(k) == expected
+
+
+def test_titles_only():
+    an = ocparse.Analyzer([('', 'title'), ('', 'other')])
+    assert an.bitworth() == []
+    assert an.bitsetworth(2) == []
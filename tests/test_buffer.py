@@ -0,0 +1,28 @@
+import array
+import struct
+
+import pytest
+
+from helpers import armv4t_parser, linear_results, WORDS
+
+WS = WORDS[:2000]
+
+
+@pytest.mark.parametrize('endian', ['little', 'big'])
+def test_parse_buffer(endian):
+    p = armv4t_parser()
+    expected = linear_results(p, WS)
+    buf = struct.pack(('<' if endian == 'little' else '>') +
+                      '{}I'.format(len(WS)), *WS)
+    p.compile('tree')
+    assert p.parse_buffer(buf, endian=endian) == expected
+    assert p.parse_buffer(bytearray(buf) + b'\0', endian=endian) == expected
+    assert p.parse_buffer(memoryview(buf)[4:], endian=endian) == expected[1:]
+
+
+def test_parse_buffer_offset_stride():
+    p = armv4t_parser()
+    expected = linear_results(p, WS)
+    buf = b''.join(b'\xff\xff' + struct.pack('<I', w) for w in WS)
+    assert p.parse_buffer(buf, offset=2, stride=6) == expected
+    assert p.parse_buffer(array.array('I', WS)) == expected
@@ -0,0 +1,24 @@
+from helpers import armv4t_parser, linear_results, check, WORDS
+
+
+def test_cache_matches_linear():
+    p = armv4t_parser(priorities=True, cache_size=256)
+    expected = linear_results(p)
+    check(p, expected)
+    p.compile('tree')
+    check(p, expected)
+    info = p.cache_info()
+    assert info['size'] == 256
+    assert info['hits'] + info['misses'] == 2 * len(WORDS)
+    assert info['evictions'] == info['misses'] - 256
+
+
+def test_cache_hits_and_invalidation():
+    p = armv4t_parser(cache_size=16)
+    w = WORDS[-1]
+    first = p.parse(w)
+    assert p.parse(w) is first
+    assert p.cache_info()['hits'] == 1
+    p.set_priority(p.opcodes[0][0].name, 5)
+    assert p.cache_info()['size'] == 0
+    assert p.parse(w) == p._parse_linear(w)
@@ -0,0 +1,84 @@
+import pytest
+
+import ocparse
+from helpers import armv4t_analyzer
+
+
+def listing(an):
+    return [(c.pattern(), c.desc, c.seps, c.care_mask, c.value)
+            for c in an.codes[an.cp]]
+
+
+def pair():
+    an = armv4t_analyzer()
+    an.newsep([4, 8])
+    cp = an.copy_current()
+    cp.compact()
+    assert isinstance(cp.codes[cp.cp], ocparse._CodeColumns)
+    return an, cp
+
+
+def same(an, cp, compact=True):
+    assert isinstance(cp.codes[cp.cp], ocparse._CodeColumns) == compact
+    assert len(cp) == len(an)
+    assert str(cp) == str(an)
+    assert listing(cp) == listing(an)
+    assert cp.ambiguities() == an.ambiguities()
+    assert cp.bitworth() == an.bitworth()
+
+
+def test_compact_keeps_codes():
+    an, cp = pair()
+    same(an, cp)
+    assert cp.bitsetworth(2) == an.bitsetworth(2)
+
+
+@pytest.mark.parametrize('bits', [[0], [3, 4, 5], [28, 29, 30, 31],
+                                  list(range(0, 32, 2))])
+def test_compact_rmbits(bits):
+    an, cp = pair()
+    an.rmbits(bits)
+    cp.rmbits(bits)
+    same(an, cp)
+
+
+@pytest.mark.parametrize('field,val', [('c', '1'), ('c', '0'), ('n', 'x'),
+                                       ('d', 'n')])
+def test_compact_replace_field(field, val):
+    an, cp = pair()
+    an.replace_field(field, val, list(range(0, len(an), 2)))
+    cp.replace_field(field, val, list(range(0, len(cp), 2)))
+    same(an, cp)
+    an.replace_field(field, val)
+    cp.replace_field(field, val)
+    same(an, cp)
+
+
+def test_compact_replace_string_falls_back_to_list():
+    an, cp = pair()
+    an.replace_field('cccc', '1110')
+    cp.replace_field('cccc', '1110')
+    same(an, cp, compact=False)
+
+
+@pytest.mark.parametrize('excpt', [[], ['1111'], [1]])
+def test_compact_expand_field(excpt):
+    an, cp = pair()
+    an.expand_field('c', excpt=excpt)
+    cp.expand_field('c', excpt=excpt)
+    same(an, cp)
+    an.rmbits([28, 29])
+    cp.rmbits([28, 29])
+    same(an, cp)
+    cp.undo()
+    an.undo()
+    same(an, cp)
+
+
+def test_compact_lazy_expand_and_limits():
+    an, cp = pair()
+    an.expand_field('s', lazy=True)
+    cp.expand_field('s', lazy=True)
+    assert listing(cp) == listing(an)
+    with pytest.raises(Exception):
+        ocparse.Analyzer([('0' * 65, 'long')]).compact()
@@ -0,0 +1,93 @@
+import pickle
+
+import pytest
+
+import ocparse
+from helpers import armv4t_parser, linear_results, check, WORDS
+from test_numpy import classify_reference
+
+COND = ocparse.field_ne('cond', 15)
+
+
+def wide_parser(flt, **kwargs):
+    """Return parser whose filter needs too many cubes to fold exactly
+
+    """
+    p = ocparse.Parser(**kwargs)
+    p.add(ocparse.Opcode('wide', '1010xxxxxxxxxxxxyyyyyyyy********', flt))
+    p.add(ocparse.Opcode('any', '1*1*****************************'))
+    return p
+
+
+def wide_constraint():
+    return (ocparse.field_in('x', range(0, 4096, 3)) &
+            ocparse.field_range('y', 17, 200)) | ocparse.field_eq('y', 3)
+
+
+def wide_function(d):
+    return (d['x'] % 3 == 0 and 17 <= d['y'] <= 200) or d['y'] == 3
+
+
+def wide_words():
+    ws = [w | 0xa0000000 for w in WORDS] + WORDS
+    return ws + [0xa0000300 | x << 16 for x in range(0, 4096, 7)]
+
+
+@pytest.mark.parametrize('method', [None, 'tree', 'table'])
+@pytest.mark.parametrize('generate', [False, True])
+@pytest.mark.parametrize('result_type', ['dict', 'record'])
+def test_constraint_like_function(method, generate, result_type):
+    expected = linear_results(armv4t_parser())
+    p = armv4t_parser(COND, result_type=result_type)
+    ws = wide_words()
+    wide_expected = linear_results(wide_parser(wide_function), ws)
+    q = wide_parser(wide_constraint(), result_type=result_type)
+    if method:
+        p.compile(method, generate=generate)
+        q.compile(method, generate=generate)
+    if result_type == 'record':
+        assert [[dict(r) for r in p.parse(w)] for w in WORDS] == expected
+        assert [[dict(r) for r in q.parse(w)] for w in ws] == wide_expected
+    else:
+        check(p, expected)
+        check(q, wide_expected, ws)
+
+
+@pytest.mark.parametrize('method', [None, 'tree'])
+def test_constraint_dump_and_pickle(tmp_path, method):
+    expected = linear_results(armv4t_parser())
+    p = armv4t_parser(COND)
+    if method:
+        p.compile(method)
+    path = str(tmp_path / 'cond.ocp')
+    p.dump(path)
+    check(ocparse.Parser.load(path), expected)
+    check(pickle.loads(pickle.dumps(p)), expected)
+
+
+def test_constraint_classify_array():
+    np = pytest.importorskip('numpy')
+    ref = armv4t_parser()
+    p = armv4t_parser(COND)
+    index, ambiguous = p.classify_array(np.array(WORDS, dtype=np.uint32))
+    assert (index.tolist(), ambiguous.tolist()) == \
+        classify_reference(ref, WORDS)
+    ws = wide_words()
+    q = wide_parser(wide_constraint())
+    index, ambiguous = q.classify_array(np.array(ws, dtype=np.uint32))
+    assert (index.tolist(), ambiguous.tolist()) == \
+        classify_reference(wide_parser(wide_function), ws)
+
+
+def test_constraint_values_are_integers():
+    for make in (lambda: ocparse.field_in('a', ['1; x']),
+                 lambda: ocparse.field_eq('a', '0 or 1'),
+                 lambda: ocparse.field_ne('a', 1.5),
+                 lambda: ocparse.field_range('a', 0, '9')):
+        with pytest.raises(TypeError):
+            make()
+    with pytest.raises(TypeError):
+        ocparse.Constraint(('in', 'a', frozenset(['__import__("os")'])))
+    c = ocparse.field_in('a', [True, 3]) & ocparse.field_ne('b', 2)
+    assert repr(c) == "(field_in('a', [1, 3]) & field_ne('b', 2))"
+    assert c({'a': 1, 'b': 0}) and not c({'a': 2, 'b': 0})
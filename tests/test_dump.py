@@ -0,0 +1,51 @@
+import marshal
+
+import pytest
+
+from helpers import ocparse, armv4t_parser, linear_results, check
+
+
+@pytest.mark.parametrize('method', [None, 'tree', 'table'])
+@pytest.mark.parametrize('priorities', [False, True])
+def test_dump_load(tmp_path, method, priorities):
+    p = armv4t_parser(priorities=priorities)
+    expected = linear_results(p)
+    if method is not None:
+        p.compile(method)
+    path = str(tmp_path / 'armv4t.ocp')
+    p.dump(path)
+    q = ocparse.Parser.load(path)
+    assert q._compile_args == p._compile_args
+    check(q, expected)
+
+
+def test_dump_needs_named_filters(tmp_path):
+    p = armv4t_parser(flt=lambda d: d['cond'] != 15)
+    with pytest.raises(Exception):
+        p.dump(str(tmp_path / 'armv4t.ocp'))
+
+
+def test_load_rejects_other_files(tmp_path):
+    path = str(tmp_path / 'other.ocp')
+    with open(path, 'wb') as file:
+        file.write(b'\xe3\0\0\0')
+    with pytest.raises(Exception):
+        ocparse.Parser.load(path)
+
+
+def test_load_without_result_type(tmp_path):
+    p = armv4t_parser()
+    expected = linear_results(p)
+    path = str(tmp_path / 'old.ocp')
+    p.dump(path)
+    with open(path, 'rb') as file:
+        data = marshal.load(file)
+    # as written before segments and result types were saved
+    data['version'] = 1
+    del data['result_type']
+    data['opcodes'] = [o if o[7] else o[:7] for o in data['opcodes']]
+    with open(path, 'wb') as file:
+        marshal.dump(data, file)
+    q = ocparse.Parser.load(path)
+    assert q.result_type == 'dict'
+    check(q, expected)
@@ -0,0 +1,87 @@
+import pytest
+
+import ocparse
+
+
+def listing(codes):
+    return [(c.pattern(), c.desc, c.care_mask, c.value) for c in codes]
+
+
+def reference_expand(pattern, desc, field, excpt=()):
+    """Reference: substitute every value of the field in the string
+
+    """
+    iis = [ii for ii, ch in enumerate(pattern) if ch == field]
+    if not iis:
+        return [(pattern, desc)]
+    fmt = '{{:0{}b}}'.format(len(iis))
+    out = []
+    for v in range(2**len(iis)):
+        p = fmt.format(v)
+        if p in excpt:
+            continue
+        s = list(pattern)
+        for ii, ch in zip(iis, p):
+            s[ii] = ch
+        out.append((''.join(s), desc + '_' + field + p))
+    return out
+
+
+PATTERNS = [('1a0b|aa*b', 'A'), ('0bb*', 'B'), ('aaaa', 'C'), ('11', 'D')]
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+@pytest.mark.parametrize('excpt', [[], ['000', '111', '1'], [1]])
+def test_expand_matches_reference(lazy, excpt):
+    an = ocparse.Analyzer(PATTERNS)
+    an.expand_field('a', excpt=excpt, lazy=lazy)
+    expected = []
+    for p, d in PATTERNS:
+        expected += reference_expand(p.replace('|', ''), d, 'a', excpt)
+    assert [(c.pattern(), c.desc) for c in an.get_codes()] == expected
+    assert len(an.codes[an.cp]) == len(expected)
+
+
+def test_lazy_matches_eager_chained():
+    eager = ocparse.Analyzer(PATTERNS)
+    lazy = ocparse.Analyzer(PATTERNS)
+    for f, cno in (('a', [0, 2]), ('b', None)):
+        eager.expand_field(f, cno)
+        lazy.expand_field(f, cno, lazy=True)
+    codes = lazy.codes[lazy.cp]
+    assert isinstance(codes, ocparse._ExpandedCodes)
+    assert isinstance(codes.base, ocparse._ExpandedCodes)
+    assert len(codes) == len(eager)
+    assert listing(codes) == listing(eager.get_codes())
+    assert listing([codes[5], codes[-1]]) == \
+        listing([eager.get_codes()[5], eager.get_codes()[-1]])
+    with pytest.raises(IndexError):
+        codes[len(codes)]
+
+
+def test_lazy_expand_with_int_exceptions():
+    for lazy in (False, True):
+        an = ocparse.Analyzer([('1bb0', 'A'), ('0bb*', 'B')])
+        an.expand_field('b', excpt=[1], lazy=lazy)
+        assert len(an) == 8
+
+
+def test_lazy_expansion_streams():
+    an = ocparse.Analyzer([('a' * 16 + 'b' * 8, 'big')])
+    an.expand_field('a', lazy=True)
+    an.expand_field('b', lazy=True)
+    assert len(an) == 2**24
+    first = next(iter(an.codes[an.cp]))
+    assert first.pattern() == '0' * 24
+    assert first.desc == 'big_a' + '0' * 16 + '_b' + '0' * 8
+
+
+def test_lazy_set_becomes_list_when_changed():
+    an = ocparse.Analyzer(PATTERNS)
+    an.expand_field('a', lazy=True)
+    n = len(an)
+    an.undo()
+    an.redo()
+    an.delcodes([0])
+    assert isinstance(an.codes[an.cp], list)
+    assert len(an) == n - 1
@@ -0,0 +1,109 @@
+import random
+
+import pytest
+
+import ocparse
+
+MOVW = '11110i100100iiii0iiiddddiiiiiiii'
+MOVW_ORDER = [19, 18, 17, 16, 26, 14, 13, 12, 7, 6, 5, 4, 3, 2, 1, 0]
+BEQ = 'iiiiiiisssssrrrrr000iiiii1100011'
+BEQ_ORDER = [31, 7, 30, 29, 28, 27, 26, 25, 11, 10, 9, 8]
+
+
+def gather(code, bits):
+    v = 0
+    for b in bits:
+        v = v << 1 | code >> b & 1
+    return v
+
+
+def parser(**kwargs):
+    p = ocparse.Parser(**kwargs)
+    p.add(ocparse.Opcode('movw', MOVW, field_order={'i': MOVW_ORDER}))
+    beq = ocparse.Opcode('beq', BEQ)
+    beq.set_field_order('i', BEQ_ORDER)
+    p.add(beq)
+    p.add(ocparse.Opcode('split', '1111aaaa0000aaaa' + '*' * 16))
+    return p
+
+
+def words(n=3000, seed=5):
+    rnd = random.Random(seed)
+    ws = []
+    for _ in range(n):
+        for p in (MOVW, BEQ):
+            care, value = ocparse._care_value(p)
+            ws.append(rnd.getrandbits(32) & ~care | value)
+        ws.append(rnd.getrandbits(32))
+    return ws
+
+
+def reference(code):
+    out = []
+    care, value = ocparse._care_value(MOVW)
+    if code & care == value:
+        out.append({'name': 'movw', 'd': code >> 8 & 15,
+                    'i': gather(code, MOVW_ORDER)})
+    care, value = ocparse._care_value(BEQ)
+    if code & care == value:
+        out.append({'name': 'beq', 'r': code >> 15 & 31,
+                    's': code >> 20 & 31, 'i': gather(code, BEQ_ORDER)})
+    if code >> 28 == 15 and not code >> 20 & 15:
+        out.append({'name': 'split',
+                    'a': (code >> 24 & 15) << 4 | code >> 16 & 15})
+    return out
+
+
+WORDS = words()
+EXPECTED = [reference(w) for w in WORDS]
+
+
+def test_known_values():
+    p = parser()
+    # movw r1, #0xabcd
+    assert p.parse(0xf64a31cd) == [{'name': 'movw', 'd': 1, 'i': 0xabcd}]
+    # beq x1, x2, -4
+    (d,) = p.parse(0xfe208ee3)
+    assert (d['r'], d['s'], d['i']) == (1, 2, 0xffe)
+
+
+@pytest.mark.parametrize('method', [None, 'tree', 'table'])
+@pytest.mark.parametrize('generate', [False, True])
+def test_field_order_in_every_mode(method, generate):
+    p = parser(cache_size=256)
+    if method:
+        p.compile(method, generate=generate)
+    assert [p.parse(w) for w in WORDS] == EXPECTED
+
+
+def test_field_order_records_and_dump(tmp_path):
+    p = parser(result_type='record')
+    p.compile('tree')
+    assert [[dict(r) for r in p.parse(w)] for w in WORDS] == EXPECTED
+    path = str(tmp_path / 'fields.ocp')
+    p.dump(path)
+    q = ocparse.Parser.load(path)
+    assert [[dict(r) for r in q.parse(w)] for w in WORDS] == EXPECTED
+
+
+def test_fields_array():
+    np = pytest.importorskip('numpy')
+    p = parser()
+    w = np.array(WORDS, dtype=np.uint32)
+    for name, order in (('movw', MOVW_ORDER), ('beq', BEQ_ORDER)):
+        assert list(p.fields_array(w, name)['i']) == \
+            [gather(x, order) for x in WORDS]
+
+
+def test_field_order_errors():
+    opc = ocparse.Opcode('beq', BEQ)
+    assert opc.fields() == ('r', 's', 'i')
+    with pytest.raises(Exception):
+        opc.set_field_order('i', BEQ_ORDER[:-1])
+    with pytest.raises(Exception):
+        opc.set_field_order('i', BEQ_ORDER[:-1] + [31])
+    with pytest.raises(Exception):
+        opc.set_field_order('q', [0])
+    opc.set_field_order('r', [15, 16, 17, 18, 19])
+    assert opc.decode(0b00001 << 15 | 0b1100011) == \
+        {'name': 'beq', 's': 0, 'r': 16, 'i': 0}
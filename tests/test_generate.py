@@ -0,0 +1,62 @@
+import importlib.util
+
+import pytest
+
+from helpers import armv4t_parser, overlap_parser, linear_results, check, \
+    WORDS
+
+
+@pytest.mark.parametrize('method', [None, 'tree', 'table'])
+@pytest.mark.parametrize('priorities', [False, True])
+def test_generated_decoder(method, priorities):
+    p = armv4t_parser(priorities=priorities)
+    expected = linear_results(p)
+    if method is not None:
+        p.compile(method, generate=True)
+        check(p, expected)
+    decode = p.generate_decoder()
+    assert [decode(w) for w in WORDS] == expected
+
+
+def test_generated_decoder_overlap():
+    p = overlap_parser()
+    ws = list(range(16))
+    p.compile('tree', generate=True)
+    check(p, linear_results(p, ws), ws)
+
+
+def test_generated_module(tmp_path):
+    p = armv4t_parser()
+    expected = linear_results(p)
+    p.compile('tree')
+    path = str(tmp_path / 'armv4t_decoder.py')
+    p.generate_decoder(path)
+    spec = importlib.util.spec_from_file_location('armv4t_decoder', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    assert [module.decode(w) for w in WORDS] == expected
+
+
+def test_generated_module_needs_named_filters(tmp_path):
+    p = armv4t_parser(flt=lambda d: d['cond'] != 15)
+    with pytest.raises(Exception):
+        p.generate_decoder(str(tmp_path / 'decoder.py'))
+
+
+def test_generated_record_module(tmp_path):
+    p = armv4t_parser(result_type='record')
+    expected = linear_results(p)
+    path = str(tmp_path / 'record_decoder.py')
+    p.generate_decoder(path)
+    with open(path) as file:
+        source = file.read()
+    assert 'import ocparse' in source
+    spec = importlib.util.spec_from_file_location('record_decoder', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    assert [module.decode(w) for w in WORDS] == expected
+    p = armv4t_parser()
+    p.generate_decoder(path)
+    with open(path) as file:
+        assert 'ocparse' not in file.read().replace(
+            'ocparse.Parser.generate_decoder', '')
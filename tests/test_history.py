@@ -0,0 +1,91 @@
+import contextlib
+import io
+
+import ocparse
+
+
+def listing(an):
+    return [(c.pattern(), c.desc) for c in an.get_codes()]
+
+
+def make(**kwargs):
+    return ocparse.Analyzer([('00aa', 'A'), ('01bb', 'B'), ('1ccc', 'C')],
+                            **kwargs)
+
+
+def test_undo_redo_restores_each_step():
+    an = make()
+    steps = [listing(an)]
+    an.rmbits([3])
+    steps.append(listing(an))
+    an.replace_field('a', '1')
+    steps.append(listing(an))
+    an.newcode('0000', 'D', 1)
+    steps.append(listing(an))
+    an.delcodes([0])
+    steps.append(listing(an))
+    an.move(2, 0)
+    steps.append(listing(an))
+    an.expand_field('c')
+    steps.append(listing(an))
+    for s in reversed(steps[:-1]):
+        an.undo()
+        assert listing(an) == s
+    for s in steps[1:]:
+        an.redo()
+        assert listing(an) == s
+
+
+def test_steps_share_unchanged_opcodes():
+    an = make()
+    an.replace_field('b', '10')
+    old, new = an.codes[0], an.codes[1]
+    assert old[0] is new[0] and old[2] is new[2]
+    assert old[1] is not new[1]
+    assert old[1].pattern() == '01bb'
+    an.newsep([2], [0])
+    assert len(an.codes) == 2
+    assert an.codes[1][0].seps == ['', '', '|', '', '']
+    assert old[0].seps == ['', '', '', '', '']
+
+
+def test_new_step_deletes_future():
+    an = make()
+    an.rmbits([0])
+    an.rmbits([0])
+    an.undo()
+    an.undo()
+    an.delcodes([2])
+    assert len(an.codes) == 2 and an.cp == 1
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        an.redo()
+    assert 'nothing to redo' in out.getvalue()
+
+
+def test_max_history_evicts_oldest():
+    an = make(max_history=3)
+    for n in range(5):
+        an.newcode('1111', 'N{}'.format(n))
+    assert len(an.codes) == 3 and an.cp == 2
+    assert len(an) == 8
+    an.undo()
+    an.undo()
+    assert len(an) == 6
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        an.undo()
+    assert 'nothing to undo' in out.getvalue()
+    assert len(an) == 6
+
+
+def test_max_history_one_and_copies():
+    an = make(max_history=1)
+    an.rmbits([0])
+    an.rmbits([0])
+    assert len(an.codes) == 1 and an.cp == 0
+    assert listing(an)[0] == ('00', 'A')
+    cp = an.copy_current()
+    assert cp.max_history == 1
+    cp.rmbits([0])
+    assert listing(an)[0] == ('00', 'A')
@@ -0,0 +1,56 @@
+import struct
+
+from helpers import armv4t_parser, linear_results, WORDS
+
+WS = WORDS[:3000]
+
+
+def write_image(tmp_path, ws=WS):
+    path = str(tmp_path / 'image.bin')
+    with open(path, 'wb') as file:
+        file.write(struct.pack('<{}I'.format(len(ws)), *ws))
+    return path
+
+
+def test_iter_file(tmp_path):
+    p = armv4t_parser()
+    expected = linear_results(p, WS)
+    path = write_image(tmp_path)
+    p.compile('tree')
+    got = list(p.iter_file(path, chunk_words=100))
+    assert [a for a, r in got] == list(range(0, 4 * len(WS), 4))
+    assert [r for a, r in got] == expected
+
+
+def test_iter_file_skip_and_resume(tmp_path):
+    p = armv4t_parser()
+    expected = dict(zip(range(0, 4 * len(WS), 4), linear_results(p, WS)))
+    path = write_image(tmp_path)
+    skip = [(400, 800), (1002, 1010), (11000, 20000)]
+    got = list(p.iter_file(path, chunk_words=64, skip=skip))
+    offsets = [a for a, r in got]
+    for a, b in skip:
+        assert not [x for x in offsets if x + 4 > a and x < b]
+    # words after an unaligned skipped region start at its end
+    assert 1010 in offsets
+    assert offsets[-1] == 10994
+    with open(path, 'rb') as file:
+        data = file.read()
+    for a, r in got:
+        assert r == p.parse(struct.unpack_from('<I', data, a)[0])
+        if a % 4 == 0:
+            assert r == expected[a]
+    # resuming from a yielded offset continues the same sequence
+    k = len(got) // 2
+    resumed = list(p.iter_file(path, chunk_words=64, skip=skip,
+                               start=offsets[k]))
+    assert resumed == got[k:]
+
+
+def test_iter_file_end_and_empty(tmp_path):
+    p = armv4t_parser()
+    path = write_image(tmp_path)
+    assert len(list(p.iter_file(path, start=8, end=30))) == 5
+    empty = str(tmp_path / 'empty.bin')
+    open(empty, 'wb').close()
+    assert list(p.iter_file(empty)) == []
@@ -0,0 +1,103 @@
+import random
+
+import pytest
+
+import ocparse
+from helpers import armv4t_spec
+from test_ambiguities import random_analyzer
+
+
+def listing(an):
+    return [(c.pattern(), c.desc) for c in an.get_codes()]
+
+
+def reference_combinecodes(an):
+    """Reference: combine pairs from the last backwards, pass by pass
+
+    """
+    codes = an.get_codes()[:]
+    combined = 1
+    while combined:
+        combined = 0
+        nc = len(codes)
+        pp = [(ii, jj) for ii in range(nc) for jj in range(ii+1, nc)]
+        deletes = []
+        while len(pp):
+            p = pp.pop()
+            c = codes[p[0]].combine(codes[p[1]])
+            if c is not None:
+                pp = [p0 for p0 in pp if not (p0[0] in p or p0[1] in p)]
+                codes[p[0]] = c
+                deletes.append(p[1])
+                combined += 1
+        for ii in sorted(deletes, reverse=True):
+            del codes[ii]
+    return [(c.pattern(), c.desc) for c in codes]
+
+
+def covered(an, nbits):
+    codes = [c for c in an.get_codes() if len(c)]
+    return {w for w in range(2**nbits)
+            if any(not (w ^ c.value) & c.care_mask for c in codes)}
+
+
+def test_combinecodes_keeps_unmerged_patterns():
+    an = ocparse.Analyzer([('0*', 'A'), ('*1', 'B')])
+    an.combinecodes()
+    assert listing(an) == [('0*', 'A'), ('*1', 'B')]
+    an = ocparse.Analyzer([('0000', 'x'), ('1111', 'y'), ('0101', 'z'),
+                           ('1100', 'w')])
+    an.title(0, 'T_A')
+    an.title(3, 'T_B')
+    before = listing(an)
+    an.combinecodes()
+    assert listing(an) == before
+    an = ocparse.Analyzer([('0000', 'x'), ('0001', 'y'), ('1111', 'z')])
+    an.combinecodes()
+    assert listing(an) == [('000*', 'x y'), ('1111', 'z')]
+    an.undo()
+    assert len(an) == 3
+
+
+def test_combinecodes_armv4t():
+    an = armv4t_spec.m31.copy_current()
+    expected = reference_combinecodes(an)
+    an.combinecodes()
+    assert listing(an) == expected
+    assert len(an) == 11
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_combinecodes_random(seed):
+    rnd = random.Random(seed)
+    patterns = [(''.join(rnd.choice('01*a') for _ in range(rnd.choice([
+        3, 5]))), 'op{}'.format(ii)) for ii in range(80)]
+    an = ocparse.Analyzer(patterns)
+    expected = reference_combinecodes(an)
+    an.combinecodes()
+    assert listing(an) == expected
+
+
+@pytest.mark.parametrize('method', ['qm', 'espresso'])
+@pytest.mark.parametrize('seed', range(3))
+def test_minimize_covers_same_codes(method, seed):
+    an = random_analyzer(40, 8, seed)
+    before = covered(an, 8)
+    an.minimize(method)
+    assert covered(an, 8) == before
+
+
+@pytest.mark.parametrize('method', ['qm', 'espresso'])
+def test_minimize_keep_descriptions(method):
+    an = ocparse.Analyzer([('0000', 'x'), ('0001', 'x'), ('0011', 'y'),
+                           ('0010', 'y'), ('1111', 'z')])
+    an.minimize(method, desc='keep')
+    assert listing(an) == [('000*', 'x'), ('001*', 'y'), ('1111', 'z')]
+
+
+def test_minimize_unknown_method():
+    an = ocparse.Analyzer([('0000', 'x')])
+    with pytest.raises(Exception):
+        an.minimize('exact')
+    with pytest.raises(Exception):
+        an.minimize(desc='first')
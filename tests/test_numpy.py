@@ -0,0 +1,43 @@
+import pytest
+
+from helpers import armv4t_parser, overlap_parser, WORDS
+
+np = pytest.importorskip('numpy')
+
+
+def classify_reference(p, ws):
+    names = [o[0].name for o in p.opcodes]
+    index = []
+    ambiguous = []
+    for w in ws:
+        r = p._parse_linear(w)
+        index.append(names.index(r[0]['name']) if r else -1)
+        ambiguous.append(len(r) > 1)
+    return index, ambiguous
+
+
+@pytest.mark.parametrize('priorities', [False, True])
+def test_classify_array(priorities):
+    p = armv4t_parser(priorities=priorities)
+    index, ambiguous = p.classify_array(np.array(WORDS, dtype=np.uint32))
+    assert (index.tolist(), ambiguous.tolist()) == \
+        classify_reference(p, WORDS)
+
+
+def test_classify_array_overlap():
+    p = overlap_parser()
+    ws = list(range(16))
+    index, ambiguous = p.classify_array(np.array(ws, dtype=np.uint8))
+    assert (index.tolist(), ambiguous.tolist()) == classify_reference(p, ws)
+
+
+def test_fields_array():
+    p = armv4t_parser()
+    arr = np.array(WORDS, dtype=np.uint32)
+    for opc, pri in p.opcodes[::7]:
+        fields = p.fields_array(arr, opc.name)
+        for k, w in enumerate(WORDS[::50]):
+            d = opc.decode(w)
+            if d is not None:
+                assert {f: int(v[k * 50]) for f, v in fields.items()} == \
+                    {f: d[f] for f in fields}
@@ -0,0 +1,77 @@
+import pytest
+
+import ocparse
+from helpers import armv4t_parser, overlap_parser, linear_results, check, \
+    WORDS
+
+
+def rotated():
+    """Return parser where weights reverse the order of equal priorities
+
+    """
+    p = ocparse.Parser()
+    for name, pattern in (('x', '0***'), ('y', '*0**'), ('z', '**0*')):
+        p.add(ocparse.Opcode(name, pattern))
+    return p, {'x': 10, 'y': 1, 'z': 5}
+
+
+@pytest.mark.parametrize('method', [None, 'tree', 'table'])
+@pytest.mark.parametrize('generate', [False, True])
+def test_optimize_keeps_results(method, generate):
+    p = armv4t_parser(priorities=True)
+    expected = linear_results(p)
+    if method:
+        p.compile(method, generate=generate)
+    weights = p.optimize(WORDS[::7])
+    assert weights and all(w >= 0 for w in weights.values())
+    check(p, expected)
+
+
+@pytest.mark.parametrize('method', ['tree', 'table'])
+@pytest.mark.parametrize('generate', [False, True])
+def test_optimize_keeps_order(method, generate):
+    p, profile = rotated()
+    ws = list(range(16))
+    expected = linear_results(p, ws)
+    p.compile(method, generate=generate)
+    p.optimize(profile=profile)
+    check(p, expected, ws)
+    assert [d['name'] for d in p.parse(0)] == ['x', 'y', 'z']
+    p = overlap_parser()
+    expected = linear_results(p, ws)
+    p.compile(method, generate=generate)
+    p.optimize(profile={'u': 9, 'z': 5, 'y': 3, 'x': 1, 'w': 8})
+    check(p, expected, ws)
+
+
+def test_optimize_generated_source():
+    p, profile = rotated()
+    p.compile('tree')
+    p.optimize(profile=profile)
+    decode = p.generate_decoder()
+    assert [d['name'] for d in decode(0)] == ['x', 'y', 'z']
+
+
+def test_save_profile(tmp_path):
+    p = armv4t_parser()
+    expected = linear_results(p)
+    weights = p.optimize(WORDS[::5])
+    path = tmp_path / 'profile.json'
+    p.save_profile(str(path))
+    q = armv4t_parser()
+    q.compile('tree')
+    assert q.optimize(profile=str(path)) == weights
+    check(q, expected)
+
+
+def test_optimize_classify_array():
+    np = pytest.importorskip('numpy')
+    p = ocparse.Parser()
+    p.add(ocparse.Opcode('a', '0001aaaa'))
+    p.add(ocparse.Opcode('b', '00bbbbbb'))
+    p.optimize([0x23] * 10 + [0x13])
+    assert p.parse(0x13)[0]['name'] == 'a'
+    index, ambiguous = p.classify_array(np.array([0x13, 0x23, 0xff],
+                                                 dtype=np.uint8))
+    assert list(index) == [0, 1, -1]
+    assert list(ambiguous) == [True, False, False]
@@ -0,0 +1,53 @@
+import pickle
+import struct
+
+import pytest
+
+from helpers import ocparse, armv4t_parser, linear_results, WORDS
+
+WS = WORDS[:3000]
+BUF = struct.pack('<{}I'.format(len(WS)), *WS)
+
+
+def lambda_parser():
+    """Return parser with a filter that can not be pickled
+
+    """
+    p = armv4t_parser(flt=lambda d: d['cond'] != 15)
+    p.compile('tree')
+    return p
+
+
+def test_parse_parallel_buffer():
+    p = armv4t_parser()
+    expected = linear_results(p, WS)
+    p.compile('table')
+    got = list(p.parse_parallel(BUF, workers=2, chunk_words=256))
+    assert [a for a, r in got] == list(range(0, len(BUF), 4))
+    assert [r for a, r in got] == expected
+
+
+def test_parse_parallel_file(tmp_path):
+    p = armv4t_parser()
+    expected = linear_results(p, WS)
+    path = str(tmp_path / 'image.bin')
+    with open(path, 'wb') as file:
+        file.write(BUF + b'\0')
+    got = list(p.parse_parallel(path, workers=2, chunk_words=500,
+                                max_pending=1))
+    assert [r for a, r in got] == expected
+
+
+def test_parse_parallel_spec():
+    p = lambda_parser()
+    with pytest.raises(Exception):
+        pickle.dumps(p)
+    expected = linear_results(p, WS)
+    got = list(p.parse_parallel(BUF, workers=2, chunk_words=256,
+                                spec='test_parallel:lambda_parser'))
+    assert [r for a, r in got] == expected
+
+
+def test_parse_parallel_empty():
+    p = ocparse.Parser()
+    assert list(p.parse_parallel(b'', workers=1)) == []
@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from helpers import armv4t_parser, overlap_parser, linear_results, WORDS
+
+
+@pytest.mark.parametrize('method', [None, 'tree', 'table'])
+def test_profile_keeps_results(method):
+    p = armv4t_parser(priorities=True, cache_size=64)
+    expected = linear_results(p)
+    if method:
+        p.compile(method)
+    p.profile()
+    assert [p.parse(w) for w in WORDS] == expected
+    stats = p.profile_stats()
+    json.dumps(stats)
+    assert stats['words'] == len(WORDS)
+    assert sum(stats['candidates'].values()) == len(WORDS)
+    assert sum(stats['ns_per_word'].values()) == len(WORDS)
+    ops = stats['opcodes']
+    assert sum(st['matches'] for st in ops.values()) >= \
+        sum(1 for r in expected if r)
+    for st in ops.values():
+        assert st['attempts'] >= st['matches'] >= st['filter_calls'] \
+            >= st['filter_rejections']
+    p.profile(False)
+    assert [p.parse(w) for w in WORDS] == expected
+    assert p.profile_stats()['words'] == len(WORDS)
+
+
+def test_profile_counts():
+    p = overlap_parser()
+    p.profile()
+    for w in range(16):
+        p.parse(w)
+    ops = p.profile_stats()['opcodes']
+    assert ops['x']['matches'] == 8
+    assert ops['u']['matches'] == 8
+    assert ops['v']['filter_calls'] == 0
+    assert ops['x']['attempts'] == 16
+    p.profile()
+    assert p.profile_stats()['words'] == 0
+
+
+def test_profile_filter_counts():
+    p = armv4t_parser()
+    p.profile()
+    for w in (0xe0810002, 0xf0810002):
+        p.parse(w)
+    ops = p.profile_stats()['opcodes']
+    calls = sum(st['filter_calls'] for st in ops.values())
+    rejections = sum(st['filter_rejections'] for st in ops.values())
+    assert calls >= 2 and rejections >= 1
+
+
+def test_no_profile():
+    p = overlap_parser()
+    assert p.profile_stats() == {}
@@ -0,0 +1,48 @@
+import multiprocessing
+import pickle
+import struct
+
+import pytest
+
+from helpers import armv4t_parser, linear_results, check, WORDS
+
+
+@pytest.mark.parametrize('method', [None, 'tree', 'table'])
+def test_records_match_dicts(method):
+    p = armv4t_parser(priorities=True)
+    r = armv4t_parser(priorities=True, result_type='record')
+    expected = linear_results(p)
+    if method is not None:
+        r.compile(method)
+    got = [r.parse(w) for w in WORDS]
+    assert got == expected
+    for rs, ds in zip(got[::97], expected[::97]):
+        for rec, d in zip(rs, ds):
+            assert rec._asdict() == d
+            assert rec['name'] == d['name']
+            assert all(getattr(rec, k) == v for k, v in d.items())
+
+
+def test_pickle_used_record_parser():
+    r = armv4t_parser(result_type='record')
+    r.compile('tree')
+    expected = [r.parse(w) for w in WORDS]
+    q = pickle.loads(pickle.dumps(r))
+    check(q, expected)
+    assert pickle.loads(pickle.dumps(expected)) == expected
+
+
+def test_parse_parallel_spawn():
+    r = armv4t_parser(result_type='record')
+    ws = WORDS[:1000]
+    expected = [r.parse(w) for w in ws]
+    buf = struct.pack('<{}I'.format(len(ws)), *ws)
+    ctx = multiprocessing.get_context('spawn')
+    old = multiprocessing.get_start_method(allow_none=True)
+    multiprocessing.set_start_method(ctx.get_start_method(), force=True)
+    try:
+        got = [x for a, x in r.parse_parallel(buf, workers=2,
+                                              chunk_words=256)]
+    finally:
+        multiprocessing.set_start_method(old, force=True)
+    assert got == expected
@@ -0,0 +1,99 @@
+import array
+import random
+
+import pytest
+
+import ocparse
+
+
+def thumb_parsers():
+    p16 = ocparse.Parser()
+    p16.add(ocparse.Opcode('lsl', '00000iiiiimmmddd'))
+    p16.add(ocparse.Opcode('mov', '00100dddiiiiiiii'))
+    p16.add(ocparse.Opcode('b', '11100iiiiiiiiiii'))
+    p32 = ocparse.Parser()
+    p32.add(ocparse.Opcode('bl', '11110siiiiiiiiii11j1kiiiiiiiiiii'))
+    p32.add(ocparse.Opcode('movw', '11110i100100nnnn0iiiddddiiiiiiii'))
+    p32.add(ocparse.Opcode('ldrd', '1110100pu1w1nnnnttttssssiiiiiiii'))
+    return p16, p32
+
+
+def stream(n=3000, seed=3):
+    """Return random halfwords and the reference split into instructions
+
+    """
+    rnd = random.Random(seed)
+    units = []
+    insns = []
+    for _ in range(n):
+        first = rnd.getrandbits(16)
+        if first >> 11 in (0b11101, 0b11110, 0b11111):
+            second = rnd.getrandbits(16)
+            units += [first, second]
+            insns.append((32, first << 16 | second))
+        else:
+            units.append(first)
+            insns.append((16, first))
+    return units, insns
+
+
+def reference(insns, parsers, offset=0):
+    out = []
+    pos = offset
+    for width, code in insns:
+        out.append((pos, width // 8, parsers[width].parse(code)))
+        pos += width // 8
+    return out
+
+
+@pytest.mark.parametrize('endian', ['little', 'big'])
+def test_thumb_stream(endian):
+    p16, p32 = thumb_parsers()
+    sp = ocparse.StreamParser.thumb(p16, p32)
+    units, insns = stream()
+    buf = b''.join(u.to_bytes(2, endian) for u in units)
+    expected = reference(insns, {16: p16, 32: p32})
+    assert sp.parse_buffer(buf, endian) == expected
+    assert list(sp.iter_buffer(bytearray(buf), endian)) == expected
+    pad = b'\xaa\xbb\xcc'
+    assert sp.parse_buffer(pad + buf, endian, offset=3) == \
+        reference(insns, {16: p16, 32: p32}, offset=3)
+    if endian == 'little':
+        assert sp.parse_buffer(array.array('H', units)) == expected
+
+
+def test_thumb_stream_cut_off():
+    p16, p32 = thumb_parsers()
+    sp = ocparse.StreamParser.thumb(p16, p32)
+    buf = bytes([0x12, 0x20, 0x00, 0xf0, 0x00, 0xf8, 0x00, 0xf0, 0x01])
+    res = sp.parse_buffer(buf)
+    assert [(pos, n) for pos, n, r in res] == [(0, 2), (2, 4)]
+    assert res[0][2] == [{'name': 'mov', 'd': 0, 'i': 0x12}]
+    assert res[1][2][0]['name'] == 'bl'
+
+
+def test_other_units_and_widths():
+    p8 = ocparse.Parser()
+    p8.add(ocparse.Opcode('short', '0aaaaaaa'))
+    p24 = ocparse.Parser()
+    p24.add(ocparse.Opcode('long', '1aaaaaaabbbbbbbbcccccccc'))
+    sp = ocparse.StreamParser({8: p8, 24: p24}, {1: 24}, 8, 1)
+    res = sp.parse_buffer(bytes([0x05, 0x81, 0x02, 0x03, 0x7f]))
+    assert res == [(0, 1, [{'name': 'short', 'a': 5}]),
+                   (1, 3, [{'name': 'long', 'a': 1, 'b': 2, 'c': 3}]),
+                   (4, 1, [{'name': 'short', 'a': 0x7f}])]
+
+
+def test_stream_errors():
+    p16, p32 = thumb_parsers()
+    with pytest.raises(Exception):
+        ocparse.StreamParser({16: p16}, {}, unit=12)
+    with pytest.raises(Exception):
+        ocparse.StreamParser({16: p16, 32: p32}, {0b11110: 24})
+    with pytest.raises(Exception):
+        ocparse.StreamParser({16: p16, 32: p32}, {32: 32})
+    sp = ocparse.StreamParser({16: p16}, {0b11110: 32})
+    with pytest.raises(Exception):
+        sp.parse_buffer(b'\x00\x00')
+    with pytest.raises(Exception):
+        ocparse.StreamParser.thumb(p16, p32).parse_buffer(b'', 'middle')
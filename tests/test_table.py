@@ -0,0 +1,31 @@
+import pytest
+
+from helpers import armv4t_parser, overlap_parser, linear_results, check
+
+
+@pytest.mark.parametrize('priorities', [False, True])
+@pytest.mark.parametrize('bits', [None, [], list(range(20, 28))])
+def test_table_matches_linear(priorities, bits):
+    p = armv4t_parser(priorities=priorities)
+    expected = linear_results(p)
+    p.compile('table', bits=bits)
+    check(p, expected)
+
+
+def test_table_priorities_and_order():
+    p = overlap_parser()
+    ws = list(range(16))
+    expected = linear_results(p, ws)
+    p.compile('table', bits=[3, 1])
+    check(p, expected, ws)
+
+
+def test_index_stats():
+    p = armv4t_parser()
+    p.compile('table', bits=list(range(24, 28)))
+    stats = p.index_stats()
+    assert stats['method'] == 'table'
+    assert stats['buckets'] == 16
+    assert stats['max'] <= len(p.opcodes)
+    p.compile('tree')
+    assert p.index_stats()['method'] == 'tree'
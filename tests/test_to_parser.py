@@ -0,0 +1,53 @@
+import pytest
+
+import ocparse
+from helpers import armv4t_analyzer, cond_filter, WORDS
+
+
+def reference_parser(an, field_names, priorities, filters):
+    """Reference: add an Opcode made from each pattern string
+
+    """
+    p = ocparse.Parser()
+    names = {}
+    for c in an.get_codes():
+        if not len(c):
+            continue
+        n = names[c.desc] = names.get(c.desc, -1) + 1
+        name = c.desc if not n else '{}_{}'.format(c.desc, n)
+        opc = ocparse.Opcode(name, c.pattern(),
+                             filters.get(c.desc, ocparse._no_filter))
+        for ch, f in field_names.items():
+            if ch in opc.params or ch in opc.segments:
+                opc.rename_field(ch, f)
+        p.add(opc)
+        p.set_priority(name, priorities.get(c.desc, 0))
+    return p
+
+
+@pytest.mark.parametrize('method', ['tree', 'table'])
+@pytest.mark.parametrize('compact', [False, True])
+def test_to_parser_matches_opcodes(method, compact):
+    an = armv4t_analyzer()
+    descs = [c.desc for c in an.get_codes() if len(c)]
+    filters = {d: cond_filter for d in descs if '[1]' in d}
+    priorities = {d: ii % 3 - 1 for ii, d in enumerate(descs)}
+    field_names = {'c': 'cond', 'n': 'Rn', 'd': 'Rd'}
+    expected = reference_parser(an, field_names, priorities, filters)
+    if compact:
+        an.compact()
+    p = an.to_parser(field_names=field_names, priorities=priorities,
+                     filters=filters, method=method)
+    assert p.index_stats()['method'] == method
+    assert [p.parse(w) for w in WORDS] == [expected.parse(w) for w in WORDS]
+
+
+def test_to_parser_names_and_fields():
+    an = ocparse.Analyzer([('0aa1bb', 'op'), ('1a*b0a', 'op'),
+                           ('11cccc', 'other')])
+    an.title(0, 'title')
+    p = an.to_parser(field_names={'a': 'x', 'op': {'b': 'y'}})
+    assert [opc.name for opc, pri in p.opcodes] == ['op', 'op_1', 'other']
+    assert p.parse(0b011110) == [{'name': 'op', 'x': 3, 'y': 2}]
+    assert p.parse(0b110100) == [{'name': 'op_1', 'x': 2, 'y': 1},
+                                 {'name': 'other', 'c': 4}]
@@ -0,0 +1,53 @@
+import random
+import time
+
+import pytest
+
+from helpers import ocparse, armv4t_parser, overlap_parser, \
+    linear_results, check
+
+
+@pytest.mark.parametrize('priorities', [False, True])
+@pytest.mark.parametrize('leaf_size', [1, 4])
+def test_tree_matches_linear(priorities, leaf_size):
+    p = armv4t_parser(priorities=priorities)
+    expected = linear_results(p)
+    p.compile('tree', leaf_size=leaf_size)
+    check(p, expected)
+
+
+def test_tree_priorities_and_order():
+    p = overlap_parser()
+    ws = list(range(16))
+    expected = linear_results(p, ws)
+    p.compile('tree')
+    check(p, expected, ws)
+    assert [d['name'] for d in p.parse(0b0100)] == ['v']
+    assert [d['name'] for d in p.parse(0b1000)] == ['y', 'z', 'u']
+
+
+def test_tree_rebuilt_after_changes():
+    p = overlap_parser()
+    ws = list(range(16))
+    p.compile('tree')
+    p.parse(0)
+    p.set_priority('x', -2)
+    p.add(ocparse.Opcode('t', '11**'))
+    check(p, linear_results(p, ws), ws)
+
+
+def test_adversarial_tree():
+    # patterns fixing only a few bits used to make the tree explode
+    rnd = random.Random(0)
+    p = ocparse.Parser()
+    for ii in range(200):
+        pattern = ['*'] * 32
+        for b in rnd.sample(range(32), 4):
+            pattern[b] = rnd.choice('01')
+        p.add(ocparse.Opcode('op{}'.format(ii), ''.join(pattern)))
+    ws = [rnd.getrandbits(32) for _ in range(500)]
+    expected = linear_results(p, ws)
+    t = time.perf_counter()
+    p.compile('tree')
+    assert time.perf_counter() - t < 10
+    check(p, expected, ws)